@@ -0,0 +1,278 @@
+#! /usr/bin/env python
+"""
+Micro-benchmarks of LoggingMiddleware hot paths, driven offline with RequestFactory.
+
+For every scenario the view is first run alone and then behind the middleware, and the difference is reported as
+the per-request overhead of request logging, together with the extra peak memory allocated per request (traced
+with tracemalloc) and the number of log records emitted per request.
+
+    python benchmarks.py --save-baseline   # run and store the results as the baseline, e.g. on the base branch
+    python benchmarks.py                   # run and compare with the saved baseline
+    python benchmarks.py --timings         # also compare the overhead timings
+    python benchmarks.py get multipart     # only run some scenarios
+
+No baseline is shipped: timings and memory depend on the machine, so save one locally first. The run fails when a
+scenario emits a different number of records or allocates more than --tolerance extra peak memory than its
+baseline. Timings are only compared with --timings, and only mean something against a baseline of the same machine.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+from django.conf import settings
+
+settings.configure(ROOT_URLCONF=__name__)
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import HttpResponse, StreamingHttpResponse  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+from django.urls import re_path, resolve  # noqa: E402
+
+from request_logging.decorators import no_logging  # noqa: E402
+from request_logging.middleware import DEFAULT_MAX_BODY_LENGTH, LOGGER_NAME, LoggingMiddleware  # noqa: E402
+from test_urls import urlpatterns as test_urlpatterns  # noqa: E402
+
+
+@no_logging(value=True)
+def not_logged_view(request):
+    return HttpResponse(status=200)
+
+
+# The routes of test_urls, plus a route that is really not logged (no_logging() defaults to value=False)
+urlpatterns = test_urlpatterns + [re_path(r"^not_logged$", not_logged_view)]
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks_baseline.json")
+DEFAULT_ITERATIONS = 2000
+DEFAULT_ROUNDS = 5
+DEFAULT_TOLERANCE = 0.5
+
+
+class CountingHandler(logging.Handler):
+    """
+    Formats records like a real handler would, and counts them instead of writing them anywhere.
+    """
+
+    def __init__(self):
+        super(CountingHandler, self).__init__()
+        self.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        self.count = 0
+
+    def emit(self, record):
+        self.format(record)
+        self.count += 1
+
+
+def routed(make_request):
+    def make_routed_request():
+        # Like Django's handler, which resolves the URL inside the middleware chain, before the view runs and so
+        # before the middleware looks up the logging policy of the route
+        request = make_request()
+        request.resolver_match = resolve(request.path_info)
+        return request
+
+    return make_routed_request
+
+
+def routed_view(response, read_body=False):
+    def view(request):
+        # The views of test_urls are stand-ins, so the response is built here instead. Whether the view reads the
+        # body is part of the scenario: the middleware only captures what the view leaves unread when it logs it.
+        if read_body:
+            request.body
+        return response()
+
+    return view
+
+
+def json_response(status=200):
+    content = '{"id": 1, "name": "widget", "tags": ["a", "b"]}'
+    return lambda: HttpResponse(content, content_type="application/json", status=status)
+
+
+def streaming_response():
+    chunks = [b'{"chunk": %d}' % i for i in range(100)]
+    return StreamingHttpResponse(streaming_content=iter(chunks), content_type="application/json")
+
+
+def multipart_body():
+    return {
+        "description": u"some text field",
+        "first": io.BytesIO(b"\x89PNG\r\n\x1a\n" + os.urandom(256 * 1024)),
+        "second": io.BytesIO(b"\xff\xd8\xff\xe0" + os.urandom(256 * 1024)),
+    }
+
+
+factory = RequestFactory()
+json_body = json.dumps({"payload": "x" * (DEFAULT_MAX_BODY_LENGTH - 100)})
+
+get_request = routed(lambda: factory.get("/somewhere"))
+json_post_request = routed(lambda: factory.post("/somewhere", data=json_body, content_type="application/json"))
+
+# name: (request factory, view, settings)
+SCENARIOS = {
+    "get": (get_request, routed_view(json_response()), {}),
+    "get_colour": (get_request, routed_view(json_response()), {"REQUEST_LOGGING_ENABLE_COLORIZE": True}),
+    "json_post": (json_post_request, routed_view(json_response(), read_body=True), {}),
+    "json_post_colour": (
+        json_post_request,
+        routed_view(json_response(), read_body=True),
+        {"REQUEST_LOGGING_ENABLE_COLORIZE": True},
+    ),
+    "json_post_unread": (json_post_request, routed_view(json_response()), {}),
+    "multipart": (
+        routed(lambda: factory.post("/somewhere", data=multipart_body())),
+        routed_view(json_response(), read_body=True),
+        {},
+    ),
+    "client_error": (get_request, routed_view(json_response(404)), {}),
+    "server_error": (get_request, routed_view(json_response(500)), {}),
+    "no_logging": (
+        routed(lambda: factory.post("/not_logged", data={"field": "value"})),
+        routed_view(json_response(), read_body=True),
+        {},
+    ),
+    "drf_viewset": (routed(lambda: factory.get("/widgets")), routed_view(json_response()), {}),
+    "policy_index": (get_request, routed_view(json_response()), {"REQUEST_LOGGING_POLICY_INDEX": True}),
+    "streaming": (
+        get_request,
+        routed_view(streaming_response),
+        {"REQUEST_LOGGING_LOG_STREAMING_RESPONSES": True},
+    ),
+}
+
+
+def consume(response):
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+        response.close()
+
+
+def time_requests(handler, make_request, iterations, rounds):
+    # Like timeit, the fastest round is the one least disturbed by the rest of the machine
+    best = None
+    for _ in range(rounds):
+        requests = [make_request() for _ in range(iterations // rounds or 1)]
+        start = time.perf_counter()
+        for request in requests:
+            consume(handler(request))
+        elapsed = (time.perf_counter() - start) / len(requests)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(handler, make_request, samples=5):
+    peaks = []
+    for _ in range(samples):
+        request = make_request()
+        tracemalloc.start()
+        consume(handler(request))
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return min(peaks)
+
+
+def run_scenario(make_request, view, scenario_settings, iterations, counter):
+    overrides = dict({"REQUEST_LOGGING_ENABLE_COLORIZE": False}, **scenario_settings)
+    with override_settings(**overrides):
+        middleware = LoggingMiddleware(view)
+    # Warm up caches (route policies, regexes, imports) before measuring
+    for _ in range(10):
+        consume(middleware(make_request()))
+
+    view_time = time_requests(view, make_request, iterations, DEFAULT_ROUNDS)
+    counter.count = 0
+    logged_time = time_requests(middleware, make_request, iterations, DEFAULT_ROUNDS)
+    records = counter.count / float(iterations // DEFAULT_ROUNDS * DEFAULT_ROUNDS)
+
+    return {
+        "overhead_us": round(max(0.0, logged_time - view_time) * 1e6, 1),
+        "peak_kib": round(max(0, peak_memory(middleware, make_request) - peak_memory(view, make_request)) / 1024.0, 1),
+        "records": records,
+    }
+
+
+def compare(results, baseline, tolerance, timings=False):
+    regressions = []
+    for name, result in sorted(results.items()):
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result["records"] != expected["records"]:
+            regressions.append(
+                "{}: {} records per request, baseline {}".format(name, result["records"], expected["records"])
+            )
+        # 1KiB of slack, so scenarios that allocate next to nothing don't fail on allocator noise
+        if result["peak_kib"] > expected["peak_kib"] * (1 + tolerance) + 1:
+            regressions.append(
+                "{}: {}KiB peak memory per request, baseline {}KiB".format(
+                    name, result["peak_kib"], expected["peak_kib"]
+                )
+            )
+        if timings and result["overhead_us"] > expected["overhead_us"] * (1 + tolerance):
+            regressions.append(
+                "{}: {}us overhead per request, baseline {}us".format(
+                    name, result["overhead_us"], expected["overhead_us"]
+                )
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run, among: " + ", ".join(sorted(SCENARIOS)))
+    parser.add_argument("-n", "--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--timings", action="store_true", help="also compare the overhead timings")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error("unknown scenarios: " + ", ".join(sorted(unknown)))
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    counter = CountingHandler()
+    logger.addHandler(counter)
+
+    results = {}
+    print("{:<18} {:>12} {:>10} {:>8}".format("scenario", "overhead_us", "peak_kib", "records"))
+    for name in args.scenarios or sorted(SCENARIOS):
+        make_request, view, scenario_settings = SCENARIOS[name]
+        results[name] = run_scenario(make_request, view, scenario_settings, args.iterations, counter)
+        print("{:<18} {overhead_us:>12} {peak_kib:>10} {records:>8}".format(name, **results[name]))
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("Baseline saved to {}".format(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline in {}, run with --save-baseline to create one".format(args.baseline))
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance, args.timings)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
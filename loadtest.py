@@ -0,0 +1,310 @@
+#! /usr/bin/env python
+"""
+End-to-end load harness: serves a small Django app under a WSGI server (wsgiref, threaded) and, when uvicorn is
+installed, an ASGI server, drives concurrent traffic at it from local client threads and reports throughput,
+latency and server memory without LoggingMiddleware, with its default configuration and in each optional mode.
+
+    python loadtest.py                                  # every server and mode, 10s each
+    python loadtest.py --servers wsgi --modes none default queue --duration 30 --concurrency 32
+
+Every request logs at DEBUG to a file in a temporary directory, so handler I/O is part of the numbers. RSS is read
+from /proc (or psutil when installed) right after the run and is reported as n/a elsewhere.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+MIDDLEWARE = "request_logging.middleware.LoggingMiddleware"
+
+# mode: settings of the mode, None serving without LoggingMiddleware
+MODES = {
+    "none": None,
+    "default": {},
+    "structured": {"REQUEST_LOGGING_STRUCTURED": True},
+    "queue": {"REQUEST_LOGGING_EMITTER": "queue"},
+    "sampled": {"REQUEST_LOGGING_SAMPLE_RATE": 0.1},
+    "policy_index": {"REQUEST_LOGGING_POLICY_INDEX": True},
+    "streaming": {"REQUEST_LOGGING_LOG_STREAMING_RESPONSES": True},
+    "latency_histogram": {"REQUEST_LOGGING_LATENCY_HISTOGRAM": True},
+    "redaction": {
+        "REQUEST_LOGGING_SENSITIVE_HEADERS": ["Authorization", "Cookie"],
+        "REQUEST_LOGGING_SENSITIVE_BODY_KEYS": ["payload"],
+    },
+    "batching": {},
+}
+SERVERS = ("wsgi", "asgi")
+
+# (method, path, body) requests sent in turn by every client
+TRAFFIC = (
+    ("GET", "/json", None),
+    ("POST", "/json", json.dumps({"name": "widget", "tags": ["a", "b"], "payload": "x" * 1024})),
+    ("GET", "/no_logging", None),
+    ("GET", "/stream", None),
+)
+
+
+# The app served by the harness, in the style of test_urls.py
+
+
+def json_view(request):
+    from django.http import HttpResponse
+
+    return HttpResponse(request.body or b'{"id": 1}', content_type="application/json")
+
+
+def no_logging_view(request):
+    from django.http import HttpResponse
+
+    return HttpResponse(b'{"secret": true}', content_type="application/json")
+
+
+def stream_view(request):
+    from django.http import StreamingHttpResponse
+
+    return StreamingHttpResponse((b'{"chunk": %d}' % i for i in range(20)), content_type="application/json")
+
+
+def urls():
+    from django.urls import path
+    from django.views.decorators.csrf import csrf_exempt
+
+    from request_logging.decorators import no_logging
+
+    return [
+        path("json", csrf_exempt(json_view)),
+        path("no_logging", no_logging("Load test", value=True)(no_logging_view)),
+        path("stream", stream_view),
+    ]
+
+
+def logging_config(mode, log_dir):
+    file_handler = {"class": "logging.FileHandler", "filename": os.path.join(log_dir, mode + ".log")}
+    handler = file_handler
+    if mode == "structured":
+        handler = {"class": "request_logging.handlers.JSONLinesFileHandler", "filename": file_handler["filename"]}
+    elif mode == "batching":
+        handler = {"class": "request_logging.handlers.BatchingHandler", "target": "file", "capacity": 1000}
+    return {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "handlers": {"file": file_handler, "request_logging": handler},
+        "loggers": {"django.request": {"handlers": ["request_logging"], "level": "DEBUG", "propagate": False}},
+    }
+
+
+def serve(server, mode, port, log_dir):
+    from django.conf import settings
+
+    mode_settings = MODES[mode]
+    settings.configure(
+        DEBUG=False,
+        SECRET_KEY="load test",
+        ALLOWED_HOSTS=["*"],
+        ROOT_URLCONF=__name__,
+        MIDDLEWARE=[] if mode_settings is None else [MIDDLEWARE],
+        LOGGING=logging_config(mode, log_dir),
+        **(mode_settings or {})
+    )
+    sys.modules[__name__].urlpatterns = urls()
+
+    if server == "asgi":
+        import uvicorn
+        from django.core.asgi import get_asgi_application
+
+        uvicorn.run(get_asgi_application(), host="127.0.0.1", port=port, log_level="warning", access_log=False)
+        return
+
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+    from django.core.wsgi import get_wsgi_application
+
+    class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+        request_queue_size = 128
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    make_server(
+        "127.0.0.1", port, get_wsgi_application(), server_class=ThreadingWSGIServer, handler_class=QuietHandler
+    ).serve_forever()
+
+
+# The load generator
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_port(port, process, timeout=20.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited with {}".format(process.returncode))
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.5).close()
+            return
+        except socket.error:
+            time.sleep(0.1)
+    raise RuntimeError("server didn't listen on port {} after {}s".format(port, timeout))
+
+
+def rss_mib(pid):
+    try:
+        import psutil
+
+        return psutil.Process(pid).memory_info().rss / 1048576.0
+    except ImportError:
+        pass
+    try:
+        with open("/proc/{}/status".format(pid)) as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except IOError:
+        pass
+    return None
+
+
+def client(port, deadline, latencies, errors):
+    connection = None
+    i = 0
+    while time.time() < deadline:
+        method, path, body = TRAFFIC[i % len(TRAFFIC)]
+        i += 1
+        headers = {"Content-Type": "application/json"} if body else {}
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.getheader("Connection", "").lower() == "close" or response.version == 10:
+                connection.close()
+                connection = None
+        except (socket.error, http.client.HTTPException):
+            errors.append(path)
+            if connection is not None:
+                connection.close()
+            connection = None
+            continue
+        latencies.append(time.perf_counter() - start)
+    if connection is not None:
+        connection.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(server, mode, duration, concurrency, warmup, log_dir):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", server, mode, str(port), log_dir],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    try:
+        wait_for_port(port, process)
+        client(port, time.time() + warmup, [], [])
+
+        latencies, errors = [], []
+        deadline = time.time() + duration
+        threads = [
+            threading.Thread(target=client, args=(port, deadline, latencies, errors)) for _ in range(concurrency)
+        ]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+        rss = rss_mib(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        "rss_mib": rss,
+        "errors": len(errors),
+    }
+
+
+def format_value(value, spec):
+    return "n/a" if value is None else format(value, spec)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=SERVERS, default=list(SERVERS))
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=sorted(MODES, key=lambda m: m != "none"))
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of traffic per server and mode")
+    parser.add_argument("--concurrency", type=int, default=16, help="number of client threads")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds of traffic before measuring")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    servers = list(args.servers)
+    if "asgi" in servers:
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            print("uvicorn isn't installed, skipping the ASGI server")
+            servers.remove("asgi")
+
+    log_dir = tempfile.mkdtemp(prefix="request-logging-loadtest-")
+    results = []
+    print("{:<6} {:<18} {:>10} {:>10} {:>10} {:>10} {:>8}".format(
+        "server", "mode", "rps", "p50_ms", "p99_ms", "rss_mib", "errors"
+    ))
+    try:
+        for server in servers:
+            for mode in args.modes:
+                result = run(server, mode, args.duration, args.concurrency, args.warmup, log_dir)
+                result.update(server=server, mode=mode)
+                results.append(result)
+                print("{:<6} {:<18} {:>10} {:>10} {:>10} {:>10} {:>8}".format(
+                    server,
+                    mode,
+                    format_value(result["rps"], ".1f"),
+                    format_value(result["p50_ms"], ".2f"),
+                    format_value(result["p99_ms"], ".2f"),
+                    format_value(result["rss_mib"], ".1f"),
+                    result["errors"],
+                ))
+                sys.stdout.flush()
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 6 and sys.argv[1] == "--serve":
+        serve(sys.argv[2], sys.argv[3], int(sys.argv[4]), sys.argv[5])
+    else:
+        sys.exit(main())
@@ -0,0 +1,68 @@
+import asyncio
+import sys
+
+from .capture import ContentTee
+from .metrics import perf_counter
+
+try:
+    # asgiref >= 3.6 (also covers Python >= 3.12, where asyncio.coroutines._is_coroutine is gone)
+    from asgiref.sync import markcoroutinefunction
+except ImportError:
+
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
+
+
+class AsyncLoggingMixin(object):
+    """
+    Lets LoggingMiddleware run natively under ASGI: when get_response is a coroutine function the middleware is
+    marked as one too, so Django doesn't wrap it in sync_to_async.
+
+    Records are formatted before the response is returned, while nothing else is touching it, and the logger is
+    always a QueueLogger in async mode: only the handler I/O runs on its worker thread, off the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def _setup_async_mode(self):
+        self.is_async = self.get_response is not None and asyncio.iscoroutinefunction(self.get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    async def __acall__(self, request):
+        timings = self._get_timings(request)
+        body_capture = self._start_exchange(request)
+        try:
+            response = await self.get_response(request)
+        except Exception as e:
+            self._log_exception(request, e, sys.exc_info())
+            raise
+        timings.view = perf_counter() - timings.started
+        sampled, cached_request_body = self._finish_exchange(request, body_capture)
+        if sampled or self._is_sampled_error(response):
+            # Tees the streaming content and reads the body now: once returned, the server is sending the response
+            self._log_exchange(request, response, cached_request_body if sampled else None)
+        else:
+            self._observe_latency(request, response)
+        self._record_exchange(request, response, cached_request_body)
+        return response
+
+
+class AsyncStreamingContentTee(ContentTee):
+    """
+    StreamingContentTee for async iterators (streaming responses with is_async set, Django >= 4.2).
+    """
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self.close()
+            raise
+        self._capture(chunk)
+        return chunk
@@ -0,0 +1,134 @@
+from .metrics import perf_counter
+
+
+class RequestBodyTee(object):
+    """
+    Wraps a request's input stream and keeps a copy of the first `limit` bytes read through it, so the body can
+    be logged without buffering the whole upload. Everything past the limit is passed through untouched.
+    `content_length` is the length of the body, finish() never reads past it.
+    """
+
+    def __init__(self, stream, limit, content_length=0):
+        self._stream = stream
+        self.limit = limit
+        self.content_length = content_length
+        self._chunks = []
+        self._captured_length = 0
+        self._read_length = 0
+        self._exhausted = False
+        # Bytes read by finish() on behalf of the logger, handed back to whoever reads the stream next
+        self._pushback = b""
+
+    def _capture(self, data, size=None):
+        if not data:
+            # An empty read means end of stream, unless nothing was asked for
+            self._exhausted = self._exhausted or size != 0
+            return data
+        self._read_length += len(data)
+        remaining = self.limit - self._captured_length
+        if remaining > 0:
+            chunk = data[:remaining]
+            self._chunks.append(chunk)
+            self._captured_length += len(chunk)
+        return data
+
+    def _unread(self, size, newline=False):
+        end = len(self._pushback)
+        if newline and b"\n" in self._pushback:
+            end = self._pushback.index(b"\n") + 1
+        if size is not None and size >= 0:
+            end = min(end, size)
+        data, self._pushback = self._pushback[:end], self._pushback[end:]
+        return data
+
+    def read(self, *args):
+        size = args[0] if args else None
+        if self._pushback:
+            data = self._unread(size)
+            if size is None or size < 0:
+                data += self._stream.read()
+            return data
+        return self._capture(self._stream.read(*args), size)
+
+    def readline(self, *args):
+        size = args[0] if args else None
+        if self._pushback:
+            data = self._unread(size, newline=True)
+            if not data.endswith(b"\n") and not self._pushback and (size is None or size < 0):
+                data += self._stream.readline()
+            return data
+        return self._capture(self._stream.readline(*args), size)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def finish(self):
+        """
+        Tops the copy up to `limit` bytes from whatever the view left unread and returns it. The bytes read here are
+        kept aside, so the body is still complete for code reading it after the middleware.
+        """
+        pushback = []
+        while not self._exhausted and self._captured_length < self.limit:
+            # Some streams (e.g. the test client's) refuse to read past the end of the body
+            size = min(self.limit - self._captured_length, self.content_length - self._read_length)
+            if size <= 0:
+                self._exhausted = True
+                break
+            pushback.append(self._capture(self._stream.read(size), size))
+        self._pushback += b"".join(pushback)
+        return b"".join(self._chunks)
+
+
+class ContentTee(object):
+    """
+    Keeps a copy of the first `limit` bytes of the chunks of a streaming response and calls on_finish(captured,
+    total_bytes, duration) once when the stream is exhausted or closed.
+
+    It implements neither iterator protocol: StreamingHttpResponse picks sync or async iteration from the protocol
+    its content implements, so each subclass implements exactly one.
+    """
+
+    def __init__(self, iterator, limit, on_finish):
+        self._iterator = iterator
+        self.limit = limit
+        self.on_finish = on_finish
+        self.total_length = 0
+        self._chunks = []
+        self._captured_length = 0
+        self._start = perf_counter()
+        self._finished = False
+
+    def _capture(self, chunk):
+        self.total_length += len(chunk)
+        remaining = self.limit - self._captured_length
+        if remaining > 0:
+            chunk = chunk[:remaining]
+            self._chunks.append(chunk)
+            self._captured_length += len(chunk)
+
+    def close(self):
+        if self._finished:
+            return
+        self._finished = True
+        self.on_finish(b"".join(self._chunks), self.total_length, perf_counter() - self._start)
+
+
+class StreamingContentTee(ContentTee):
+    """
+    Wraps the streaming_content of a streaming response: chunks are passed through untouched while a copy of the
+    first `limit` bytes is kept.
+    """
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._iterator)
+        except StopIteration:
+            self.close()
+            raise
+        self._capture(chunk)
+        return chunk
+
+    next = __next__  # Python 2
@@ -1,11 +1,11 @@
 from .middleware import NO_LOGGING_ATTR, NO_LOGGING_MSG_ATTR, NO_LOGGING_MSG, NO_LOGGING_DEFAULT_VALUE, \
     LOG_HEADERS_ATTR, LOG_HEADERS_DEFAULT_VALUE, LOG_BODY_ATTR, LOG_BODY_DEFAULT_VALUE, LOG_RESPONSE_ATTR, \
     LOG_RESPONSE_DEFAULT_VALUE, NO_RESPONSE_LOGGING_MSG_ATTR, NO_RESPONSE_LOGGING_MSG, NO_HEADER_LOGGING_MSG_ATTR, \
-    NO_HEADER_LOGGING_MSG, NO_BODY_LOGGING_MSG_ATTR, NO_BODY_LOGGING_MSG
+    NO_HEADER_LOGGING_MSG, NO_BODY_LOGGING_MSG_ATTR, NO_BODY_LOGGING_MSG, SAMPLE_RATE_ATTR
 
 
 def no_logging(msg=None, silent=False, value=None, log_headers=None, no_header_logging_msg=None, log_body=None,
-               no_body_logging_msg=None, log_response=None, no_response_logging_msg=None):
+               no_body_logging_msg=None, log_response=None, no_response_logging_msg=None, sample_rate=None):
     def _set_attr(func, attr_name, value, default_value=None):
         setattr(func, attr_name, value if value is not None else default_value)
 
@@ -24,6 +24,8 @@ def no_logging(msg=None, silent=False, value=None, log_headers=None, no_header_l
 
         _set_attr(func, LOG_RESPONSE_ATTR, log_response, LOG_RESPONSE_DEFAULT_VALUE)
         _set_attr_msg(func, silent, NO_RESPONSE_LOGGING_MSG_ATTR, no_response_logging_msg, NO_RESPONSE_LOGGING_MSG)
+
+        _set_attr(func, SAMPLE_RATE_ATTR, sample_rate)
         return func
 
     return wrapper
@@ -0,0 +1,154 @@
+import atexit
+import os
+import threading
+import time
+import weakref
+
+try:
+    import queue
+except ImportError:
+    # Python 2
+    import Queue as queue
+
+OVERFLOW_DROP_NEWEST = "drop-newest"
+OVERFLOW_DROP_OLDEST = "drop-oldest"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK)
+
+# Every QueueLogger of the process, flushed by a single exit hook
+_queue_loggers = weakref.WeakSet()
+
+
+def _flush_queue_loggers(timeout=1.0):
+    for queue_logger in list(_queue_loggers):
+        queue_logger.flush(timeout)
+
+
+atexit.register(_flush_queue_loggers)
+
+
+def detach_logging_context(logging_context):
+    """
+    Returns a copy of a logging context that is safe to emit on another thread once the response is returned: the
+    request and response of its extra are replaced by their method, path and status code, and the current time is
+    added as request_time.
+    """
+    kwargs = dict(logging_context.get("kwargs") or {})
+    extra = dict(kwargs.get("extra") or {}, request_time=time.time())
+    request = extra.get("request")
+    if request is not None:
+        extra.update(request=None, method=request.method, path=request.path)
+    response = extra.get("response")
+    if response is not None:
+        extra.update(response=None, status_code=response.status_code)
+    kwargs["extra"] = extra
+    return dict(logging_context, kwargs=kwargs)
+
+
+class QueueLogger(object):
+    """
+    Wraps a Logger so that log()/log_error() only push a (method, level, msg, logging_context) record onto a
+    bounded queue. A daemon worker thread drains the queue and does the line splitting, colouring and handler I/O,
+    so slow handlers no longer add to response latency.
+    When the queue is full, the overflow policy decides whether the newest record is dropped, the oldest queued
+    record is dropped, or the request thread blocks until there is room. Dropped records are counted in `dropped`.
+
+    Queued records only hold plain data (see detach_logging_context): handlers never see the live request and
+    response. LogRecord.created is the time the worker emits a record, the time it was logged by the request
+    thread is passed along as the record's `request_time` attribute.
+    """
+
+    is_background = True
+
+    def __init__(self, logger, maxsize, overflow=OVERFLOW_DROP_NEWEST):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy({}), should be one of {}".format(overflow, OVERFLOW_POLICIES))
+        self.logger = logger
+        self.overflow = overflow
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        _queue_loggers.add(self)
+
+    def is_enabled_for(self, level):
+        return self.logger.is_enabled_for(level)
+
+    def log(self, level, msg, logging_context):
+        # Records that would be discarded don't take a place in the queue
+        if self.is_enabled_for(level):
+            self._put(("log", level, msg, detach_logging_context(logging_context)))
+
+    def log_error(self, level, msg, logging_context):
+        if self.is_enabled_for(level):
+            self._put(("log_error", level, msg, detach_logging_context(logging_context)))
+
+    def log_record(self, level, msg, logging_context):
+        if self.is_enabled_for(level):
+            self._put(("log_record", level, msg, detach_logging_context(logging_context)))
+
+    def _put(self, record):
+        self._ensure_worker()
+        if self.overflow == OVERFLOW_BLOCK:
+            self._queue.put(record)
+            return
+        while True:
+            try:
+                self._queue.put_nowait(record)
+                return
+            except queue.Full:
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    self._count_dropped()
+                    return
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+                self._count_dropped()
+            except queue.Empty:
+                pass
+
+    def _count_dropped(self):
+        with self._lock:
+            self.dropped += 1
+
+    def _ensure_worker(self):
+        # Threads don't survive fork(), so pre-forking servers get a fresh worker in every child process
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid != os.getpid():
+                self._worker = threading.Thread(target=self._drain, name="request-logging-emitter")
+                self._worker.daemon = True
+                self._worker.start()
+                self._worker_pid = os.getpid()
+
+    def _drain(self):
+        while True:
+            method, level, msg, logging_context = self._queue.get()
+            try:
+                getattr(self.logger, method)(level, msg, logging_context)
+            except Exception:
+                # keep the worker alive, handlers already report their own errors through Handler.handleError()
+                pass
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout=None):
+        """
+        Waits until every queued record has been emitted, or until `timeout` seconds have passed.
+        Returns True if the queue was drained.
+        """
+        if self._worker_pid != os.getpid():
+            return self._queue.empty()
+        if timeout is None:
+            self._queue.join()
+            return True
+        done = threading.Event()
+        waiter = threading.Thread(target=lambda: (self._queue.join(), done.set()))
+        waiter.daemon = True
+        waiter.start()
+        return done.wait(timeout)
+
+    def __len__(self):
+        return self._queue.qsize()
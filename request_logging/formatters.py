@@ -0,0 +1,121 @@
+import base64
+import json
+import logging
+import re
+import time
+
+try:
+    # Fast encoder, used when installed
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    # Python 2
+    from collections import Mapping
+
+from .middleware import STRUCTURED_RECORD_ATTR
+
+ANSI_ESCAPE_REGEX = re.compile(r"\x1b\[[0-9;]*m")
+BODY_ENCODING_UTF8 = "utf-8"
+BODY_ENCODING_BASE64 = "base64"
+
+
+def encode_body(body):
+    """
+    Returns (body, encoding) for a logged body: text as is, bytes decoded as utf-8 when possible and
+    base64 encoded otherwise, so binary bodies survive the round trip through JSON.
+    """
+    if body is None:
+        return None, None
+    if isinstance(body, memoryview):
+        body = body.tobytes()
+    if not isinstance(body, bytes):
+        return str(body), BODY_ENCODING_UTF8
+    try:
+        return body.decode("utf-8"), BODY_ENCODING_UTF8
+    except UnicodeDecodeError:
+        return base64.b64encode(body).decode("ascii"), BODY_ENCODING_BASE64
+
+
+def _encode_headers(headers):
+    if headers is None:
+        return None
+    if isinstance(headers, Mapping):
+        values = list(headers.items())
+        # Django < 3.2 keeps response headers as {"content-type": ("Content-Type", value)}
+        if values and all(isinstance(value, tuple) and len(value) == 2 for _, value in values):
+            return {name: value for name, value in headers.values()}
+        return {str(name): str(value) for name, value in values}
+    return str(headers)
+
+
+def _default(obj):
+    if isinstance(obj, (bytes, memoryview)):
+        return encode_body(obj)[0]
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    return str(obj)
+
+
+if orjson is not None:
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+else:
+
+    def dumps(obj):
+        return json.dumps(obj, default=_default, separators=(",", ":"))
+
+
+class JSONLinesFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object on a single line, with a stable schema:
+
+        {"time", "level", "logger", "message", "method", "path", "status", "duration", "timings",
+         "request": {"headers", "body", "body_encoding"}, "response": {"headers", "body", "body_encoding"}}
+
+    The exchange fields are filled from the record's structured fields (see REQUEST_LOGGING_STRUCTURED) and are
+    null for other records. ANSI colours are stripped from the message.
+    """
+
+    def format(self, record):
+        message = record.getMessage()
+        if "\x1b" in message:
+            message = ANSI_ESCAPE_REGEX.sub("", message)
+        fields = getattr(record, STRUCTURED_RECORD_ATTR, None) or {}
+
+        request_body, request_body_encoding = encode_body(fields.get("request_body"))
+        response_body, response_body_encoding = encode_body(fields.get("response_body"))
+        # The time the request logged the record, when it was emitted later by the queue emitter
+        created = getattr(record, "request_time", record.created)
+        entry = {
+            "time": "{}.{:03d}Z".format(
+                time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(created)), int((created - int(created)) * 1000)
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": message,
+            "method": fields.get("method"),
+            "path": fields.get("path"),
+            "status": fields.get("status"),
+            "duration": fields.get("duration"),
+            "timings": fields.get("timings"),
+            "request": {
+                "headers": _encode_headers(fields.get("request_headers")),
+                "body": request_body,
+                "body_encoding": request_body_encoding,
+            },
+            "response": {
+                "headers": _encode_headers(fields.get("response_headers")),
+                "body": response_body,
+                "body_encoding": response_body_encoding,
+            },
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return dumps(entry)
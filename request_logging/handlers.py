@@ -0,0 +1,162 @@
+import io
+import logging
+import os
+import signal
+import threading
+from logging.handlers import MemoryHandler, RotatingFileHandler
+
+from .formatters import JSONLinesFormatter
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+DEFAULT_MAX_BUFFER_BYTES = 1024 * 1024
+
+
+class JSONLinesFileHandler(RotatingFileHandler):
+    """
+    Size-rotated file sink for request logs, formatted with JSONLinesFormatter by default.
+    Unlike FileHandler, records are not flushed one by one: they go through a `buffer_size` bytes write buffer,
+    which is flushed when it fills up, on rollover and when the handler is flushed or closed (logging does both
+    at interpreter shutdown). The file size used for rotation is tracked in memory rather than with a seek per
+    record, so it is approximate for non-ASCII output.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, encoding="utf-8", delay=False,
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._size = 0
+        RotatingFileHandler.__init__(
+            self, filename, mode="a", maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, delay=delay
+        )
+        self.setFormatter(JSONLinesFormatter())
+
+    def _open(self):
+        stream = io.open(self.baseFilename, self.mode, buffering=self.buffer_size, encoding=self.encoding)
+        self._size = os.fstat(stream.fileno()).st_size
+        return stream
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if 0 < self.maxBytes < self._size + len(msg) and self._size > 0:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(msg)
+            self._size += len(msg)
+        except Exception:
+            self.handleError(record)
+
+
+class BatchingHandler(MemoryHandler):
+    """
+    Buffers records in memory and hands them to `target` in batches: when `capacity` records are buffered, when
+    the buffered messages reach `max_buffer_bytes`, every `flush_interval` seconds, and when the handler is closed
+    (logging closes its handlers at interpreter exit). `flush_on_signals` optionally flushes before the given
+    signals (e.g. signal.SIGTERM sent to a worker) are handled as before.
+
+    When the target is a plain StreamHandler/FileHandler the whole batch is written with a single write and a
+    single flush; other targets receive the records one by one through their handle(). As a subclass of
+    MemoryHandler, the target can be given by name in a dictConfig LOGGING setting.
+    `max_buffer_bytes` is a hard cap: if there is no target to flush to, the oldest records are dropped.
+    """
+
+    def __init__(self, capacity=1000, flushLevel=None, target=None, flushOnClose=True, flush_interval=1.0,
+                 max_buffer_bytes=DEFAULT_MAX_BUFFER_BYTES, flush_on_signals=()):
+        MemoryHandler.__init__(self, capacity, target=target)
+        self.flushLevel = logging.CRITICAL + 1 if flushLevel is None else flushLevel
+        self.flushOnClose = flushOnClose
+        self.flush_interval = flush_interval
+        self.max_buffer_bytes = max_buffer_bytes
+        self.buffered_bytes = 0
+        self.dropped = 0
+        self._stopped = threading.Event()
+        self._flusher_pid = None
+        for signum in flush_on_signals:
+            self._flush_on_signal(signum)
+
+    def emit(self, record):
+        self._ensure_flusher()
+        self.buffer.append(record)
+        self.buffered_bytes += len(record.getMessage())
+        if self.shouldFlush(record):
+            self.flush()
+
+    def shouldFlush(self, record):
+        return MemoryHandler.shouldFlush(self, record) or self.buffered_bytes >= self.max_buffer_bytes
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.target is not None and self.buffer:
+                self._write(self.buffer)
+                self.buffer = []
+                self.buffered_bytes = 0
+            while self.buffered_bytes > self.max_buffer_bytes and self.buffer:
+                self.buffered_bytes -= len(self.buffer.pop(0).getMessage())
+                self.dropped += 1
+        finally:
+            self.release()
+
+    def _write(self, records):
+        target = self.target
+        if type(target) not in (logging.StreamHandler, logging.FileHandler):
+            for record in records:
+                target.handle(record)
+            return
+
+        msgs = [target.format(record) + target.terminator for record in records
+                if record.levelno >= target.level and target.filter(record)]
+        if not msgs:
+            return
+        target.acquire()
+        try:
+            if target.stream is None:
+                # FileHandler opened with delay=True
+                target.stream = target._open()
+            target.stream.write("".join(msgs))
+            target.flush()
+        except Exception:
+            target.handleError(records[-1])
+        finally:
+            target.release()
+
+    def _ensure_flusher(self):
+        # Threads don't survive fork(), so pre-forking servers get a fresh flusher in every child process
+        if not self.flush_interval or self._flusher_pid == os.getpid():
+            return
+        self.acquire()
+        try:
+            if self._flusher_pid != os.getpid():
+                flusher = threading.Thread(target=self._flush_periodically, name="request-logging-batch-flusher")
+                flusher.daemon = True
+                flusher.start()
+                self._flusher_pid = os.getpid()
+        finally:
+            self.release()
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def _flush_on_signal(self, signum):
+        previous = signal.getsignal(signum)
+
+        def handler(received, frame):
+            self.flush()
+            if callable(previous):
+                previous(received, frame)
+            elif previous != signal.SIG_IGN:
+                signal.signal(received, signal.SIG_DFL)
+                os.kill(os.getpid(), received)
+
+        try:
+            signal.signal(signum, handler)
+        except ValueError:
+            # signal handlers can only be installed from the main thread
+            pass
+
+    def close(self):
+        self._stopped.set()
+        MemoryHandler.close(self)
@@ -0,0 +1,67 @@
+from .redaction import normalize_header_name
+
+# Headers that the WSGI/ASGI handlers put in request.META without the HTTP_ prefix
+UNPREFIXED_META_KEYS = ("content-type", "content-length")
+
+
+def meta_key(name):
+    # "x-foo" -> "HTTP_X_FOO"
+    key = name.upper().replace("-", "_")
+    return key if name in UNPREFIXED_META_KEYS else "HTTP_" + key
+
+
+class HeaderFilter(object):
+    """
+    Selects the request and response headers to log from an `allowlist` and a `denylist` of header names, given
+    in either the "HTTP_X_FOO" or the "X-Foo" form.
+
+    Names are normalized once: with an allowlist, only the allowed headers are looked up, straight from their
+    request.META key and response header name, instead of going through all the headers of each request. With
+    only a denylist, all the headers but the denied ones are logged.
+    """
+
+    def __init__(self, allowlist=None, denylist=(), meta_names=False):
+        self.denied = frozenset(normalize_header_name(name) for name in denylist)
+        self.allowed = None
+        if allowlist is not None:
+            names = []
+            for name in (normalize_header_name(name) for name in allowlist):
+                if name not in names and name not in self.denied:
+                    names.append(name)
+            self.allowed = tuple(names)
+            # (request.META key, logged name) of each allowed header, logged like request.headers does unless
+            # meta_names is set (Django < 3.2 logs the META keys)
+            self._request_keys = tuple(
+                (meta_key(name), meta_key(name) if meta_names else name.title()) for name in names
+            )
+            self._response_names = tuple(name.title() for name in names)
+        self.meta_names = meta_names
+
+    @property
+    def active(self):
+        return self.allowed is not None or bool(self.denied)
+
+    def is_denied(self, name):
+        # Not memoized: header names come from clients, a cache keyed by them would grow without bound
+        return bool(self.denied) and normalize_header_name(name) in self.denied
+
+    def request_headers(self, request):
+        """
+        Returns the (name, value) pairs of the request headers to log.
+        """
+        if self.allowed is not None:
+            meta = request.META
+            return [(name, meta[key]) for key, name in self._request_keys if key in meta]
+        if self.meta_names:
+            headers = ((key, value) for key, value in request.META.items() if key.startswith("HTTP_"))
+        else:
+            headers = request.headers.items()
+        return [(name, value) for name, value in headers if not self.is_denied(name)]
+
+    def response_headers(self, response):
+        """
+        Returns a dict of the response headers to log.
+        """
+        if self.allowed is not None:
+            return {name: response[name] for name in self._response_names if response.has_header(name)}
+        return {name: value for name, value in response.items() if not self.is_denied(name)}
@@ -0,0 +1,89 @@
+import logging
+import re
+from collections import namedtuple
+
+# Status codes covered by the lookup tables, anything above is logged like a 2xx
+STATUS_CODES = 600
+
+# Levels of the records of one exchange: the "METHOD path" line, the request headers and body, the
+# "METHOD path - status" line and the response headers and body. When error is set the response line is logged
+# with the error colour. highest is the highest of these levels.
+LogLevels = namedtuple("LogLevels", ["request", "request_data", "response", "response_data", "error", "highest"])
+
+
+def _log_levels(request, request_data, response, response_data, error=False):
+    highest = max(request, request_data, response, response_data)
+    return LogLevels(request, request_data, response, response_data, error, highest)
+
+
+def status_class(status_code):
+    return "{}xx".format(status_code // 100)
+
+
+class LogLevelTable(object):
+    """
+    Decides the levels of an exchange from its status code and path in O(1).
+
+    The default levels per status code (see REQUEST_LOGGING_HTTP_4XX_LOG_LEVEL) are compiled with the
+    `status_levels` overrides ({404: logging.WARNING, "5xx": logging.CRITICAL}) into a STATUS_CODES entries
+    table. Each `route_levels` entry ({path regex: status levels}) gets its own table, and all the path regexes are
+    compiled into a single regex so a request path is matched once; the first matching route wins. Regexes with
+    groups or inline flags can't be combined, so the routes are matched one by one when any of them has some.
+    An overridden status code logs all the records of the exchange at the given level.
+    """
+
+    def __init__(self, log_level, http_4xx_log_level, http_4xx_as_error, status_levels=None, route_levels=None):
+        self.log_level = log_level
+        self.http_4xx_log_level = http_4xx_log_level
+        self.http_4xx_as_error = http_4xx_as_error
+        self._other = self._default_levels(STATUS_CODES)
+        defaults = [self._default_levels(status_code) for status_code in range(STATUS_CODES)]
+        self._table = self._compile(status_levels or {}, defaults)
+
+        routes = list((route_levels or {}).items())
+        self._route_tables = [self._compile(levels, self._table) for _, levels in routes]
+        self._route_regex = None
+        self._route_regexes = [self._compile_route(pattern) for pattern, _ in routes]
+        plain_flags = re.compile("").flags
+        if routes and not any(regex.groups or regex.flags != plain_flags for regex in self._route_regexes):
+            self._route_regex = re.compile(
+                "|".join("(?P<route{}>{})".format(i, pattern) for i, (pattern, _) in enumerate(routes))
+            )
+
+    def _compile_route(self, pattern):
+        try:
+            return re.compile(pattern)
+        except (re.error, TypeError) as e:
+            raise ValueError("Invalid route regex({}) in route log levels: {}".format(pattern, e))
+
+    def _default_levels(self, status_code):
+        if 400 <= status_code < 500:
+            if self.http_4xx_as_error:
+                # log as per 5xx
+                return _log_levels(logging.INFO, self.http_4xx_log_level, logging.INFO, logging.ERROR, error=True)
+            return _log_levels(logging.INFO, self.http_4xx_log_level, self.http_4xx_log_level, self.log_level)
+        if 500 <= status_code < 600:
+            return _log_levels(logging.INFO, logging.ERROR, logging.INFO, logging.ERROR, error=True)
+        return _log_levels(logging.INFO, self.log_level, logging.INFO, self.log_level)
+
+    def _compile(self, status_levels, fallback):
+        table = []
+        for status_code in range(STATUS_CODES):
+            level = status_levels.get(status_code, status_levels.get(status_class(status_code)))
+            table.append(fallback[status_code] if level is None else _log_levels(level, level, level, level))
+        return tuple(table)
+
+    def get(self, path, status_code):
+        if not isinstance(status_code, int) or not 0 <= status_code < STATUS_CODES:
+            return self._other
+        table = self._table
+        if self._route_regex is not None:
+            match = self._route_regex.match(path)
+            if match is not None:
+                table = self._route_tables[int(match.lastgroup[len("route"):])]
+        else:
+            for i, regex in enumerate(self._route_regexes):
+                if regex.match(path):
+                    table = self._route_tables[i]
+                    break
+        return table[status_code]
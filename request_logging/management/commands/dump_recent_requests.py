@@ -0,0 +1,37 @@
+try:
+    from urllib.request import Request, urlopen
+except ImportError:
+    # Python 2
+    from urllib2 import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Dumps the requests kept by the flight recorder (REQUEST_LOGGING_RECORDER_SIZE) of a running server as JSON "
+        "lines, read through the request_logging.views.recent_requests view at --url. The recorder lives in the "
+        "memory of each server process, the one of this command never records anything."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", required=True, help="URL of the recent_requests view of a running server")
+        parser.add_argument(
+            "--header",
+            action="append",
+            default=[],
+            help='"Name: value" header sent with the request, e.g. the session cookie of a staff user',
+        )
+
+    def handle(self, *args, **options):
+        request = Request(options["url"])
+        for header in options["header"]:
+            name, separator, value = header.partition(":")
+            if not separator:
+                raise CommandError('Headers should be "Name: value". {} is not.'.format(header))
+            request.add_header(name.strip(), value.strip())
+        try:
+            response = urlopen(request)
+        except IOError as e:
+            raise CommandError("Couldn't read {}: {}".format(options["url"], e))
+        self.stdout.write(response.read().decode("utf-8"), ending="")
@@ -0,0 +1,101 @@
+import threading
+
+try:
+    from time import perf_counter
+except ImportError:
+    # Python 2
+    from time import time as perf_counter
+
+# Upper bounds (in seconds) of the latency histogram buckets, the last bucket catches everything above
+HISTOGRAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+TIMING_STAGES = ("view", "resolve", "headers", "body", "multipart", "emit")
+
+
+class RequestTimings(object):
+    """
+    Seconds spent serving one request, split into the view itself and the stages of request logging work:
+    resolving the route policy, building headers, truncating bodies, parsing multipart bodies and emitting
+    records (everything else the logging did, including response formatting). started is when the view was called.
+    """
+
+    __slots__ = TIMING_STAGES + ("logging", "started")
+
+    def __init__(self):
+        for stage in self.__slots__:
+            setattr(self, stage, 0.0)
+
+    def add(self, stage, seconds):
+        setattr(self, stage, getattr(self, stage) + seconds)
+
+    @property
+    def overhead(self):
+        # Total time spent by the middleware itself
+        return self.resolve + self.logging
+
+    def as_dict(self):
+        timings = {stage: getattr(self, stage) for stage in TIMING_STAGES}
+        timings["emit"] = max(0.0, self.logging - self.headers - self.body - self.multipart)
+        timings["overhead"] = self.overhead
+        return timings
+
+
+class Histogram(object):
+    __slots__ = ("count", "sum", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.buckets = [0] * len(HISTOGRAM_BUCKETS)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, upper_bound in enumerate(HISTOGRAM_BUCKETS):
+            if seconds <= upper_bound:
+                self.buckets[i] += 1
+                break
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {str(upper_bound): count for upper_bound, count in zip(HISTOGRAM_BUCKETS, self.buckets)},
+        }
+
+
+class LatencyHistogram(object):
+    """
+    In-process histograms of view latency and request logging overhead, per route and per status class.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route_key, status_code, timings):
+        key = (route_key, "{}xx".format(status_code // 100))
+        with self._lock:
+            histograms = self._histograms.get(key)
+            if histograms is None:
+                histograms = self._histograms[key] = (Histogram(), Histogram())
+            histograms[0].observe(timings.view)
+            histograms[1].observe(timings.overhead)
+
+    def dump(self):
+        """
+        Returns {route: {status class: {"view": histogram, "overhead": histogram}}}, where each histogram is a
+        dict of its count, sum of seconds and per-bucket counts.
+        """
+        with self._lock:
+            items = [(key, view.as_dict(), overhead.as_dict()) for key, (view, overhead) in self._histograms.items()]
+        dump = {}
+        for (route_key, status_class), view, overhead in items:
+            dump.setdefault(route_key, {})[status_class] = {"view": view, "overhead": overhead}
+        return dump
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+latency_histogram = LatencyHistogram()
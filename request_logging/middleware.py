@@ -1,21 +1,73 @@
 import logging
 import re
+import sys
+import threading
+from collections import OrderedDict, namedtuple
 
 from django import VERSION as django_version
 from django.conf import settings
+from django.core.exceptions import PermissionDenied, SuspiciousOperation
+from django.http import Http404
 
 try:
     # Django >= 1.10
-    from django.urls import resolve, Resolver404
+    from django.urls import get_urlconf, resolve, Resolver404
 except ImportError:
     # Django < 1.10
-    from django.core.urlresolvers import resolve, Resolver404
+    from django.core.urlresolvers import get_urlconf, resolve, Resolver404
 from django.utils.termcolors import colorize
 
+from .capture import RequestBodyTee, StreamingContentTee
+from .emitters import OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_POLICIES, QueueLogger
+from .headers import HeaderFilter
+from .levels import LogLevelTable, status_class
+from .metrics import RequestTimings, latency_histogram, perf_counter
+from .multipart import format_part, iter_parts, parse_boundary
+from .policy_index import build_policy_index, urlconf_name
+from .recorder import DEFAULT_RECORDER_BODY_LENGTH, DEFAULT_RECORDER_SIZE, flight_recorder
+from .redaction import REDACTED, Redactor
+from .sampling import Sampler
+from .summarizers import DEFAULT_SUMMARIZERS, SummarizerRegistry, decode_text, media_type_of
+
+try:
+    from .async_support import AsyncLoggingMixin, AsyncStreamingContentTee
+except (ImportError, SyntaxError):
+    # Python 2 can't run the native async path
+    AsyncStreamingContentTee = None
+
+    class AsyncLoggingMixin(object):
+        sync_capable = True
+        async_capable = False
+
+        def _setup_async_mode(self):
+            self.is_async = False
+
+
+try:
+    text_type = unicode
+except NameError:
+    # Python 3
+    text_type = str
+
 DEFAULT_LOG_LEVEL = logging.DEBUG
 DEFAULT_HTTP_4XX_LOG_LEVEL = logging.ERROR
 DEFAULT_COLORIZE = True
+COLORIZE_AUTO = "auto"
 DEFAULT_MAX_BODY_LENGTH = 50000  # log no more than 3k bytes of content
+DEFAULT_ROUTE_CACHE_SIZE = 1024
+DEFAULT_POLICY_INDEX = False
+EMITTER_SYNC = "sync"
+EMITTER_QUEUE = "queue"
+DEFAULT_EMITTER = EMITTER_SYNC
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_QUEUE_OVERFLOW = OVERFLOW_DROP_NEWEST
+DEFAULT_STRUCTURED = False
+DEFAULT_SAMPLE_RATE = 1.0
+DEFAULT_SAMPLE_ALWAYS_LOG_ERRORS = True
+DEFAULT_RATE_LIMIT = None
+DEFAULT_LATENCY_HISTOGRAM = False
+DEFAULT_LOG_STREAMING_RESPONSES = False
+DEFAULT_TAIL_CAPTURE = False
 IS_DJANGO_VERSION_GTE_3_2_0 = django_version >= (3, 2, 0, "final", 0)
 DEFAULT_SENSITIVE_HEADERS = [
     "Authorization", "Proxy-Authorization"
@@ -25,13 +77,36 @@ DEFAULT_SENSITIVE_HEADERS = [
 SETTING_NAMES = {
     "log_level": "REQUEST_LOGGING_DATA_LOG_LEVEL",
     "http_4xx_log_level": "REQUEST_LOGGING_HTTP_4XX_LOG_LEVEL",
+    "status_log_levels": "REQUEST_LOGGING_STATUS_LOG_LEVELS",
+    "route_log_levels": "REQUEST_LOGGING_ROUTE_LOG_LEVELS",
     "legacy_colorize": "REQUEST_LOGGING_DISABLE_COLORIZE",
     "colorize": "REQUEST_LOGGING_ENABLE_COLORIZE",
     "max_body_length": "REQUEST_LOGGING_MAX_BODY_LENGTH",
     "sensitive_headers": "REQUEST_LOGGING_SENSITIVE_HEADERS",
+    "sensitive_query_params": "REQUEST_LOGGING_SENSITIVE_QUERY_PARAMS",
+    "sensitive_body_keys": "REQUEST_LOGGING_SENSITIVE_BODY_KEYS",
+    "sensitive_form_fields": "REQUEST_LOGGING_SENSITIVE_FORM_FIELDS",
+    "sensitive_patterns": "REQUEST_LOGGING_SENSITIVE_PATTERNS",
+    "route_cache_size": "REQUEST_LOGGING_ROUTE_CACHE_SIZE",
+    "policy_index": "REQUEST_LOGGING_POLICY_INDEX",
+    "policy_index_urlconfs": "REQUEST_LOGGING_POLICY_INDEX_URLCONFS",
+    "emitter": "REQUEST_LOGGING_EMITTER",
+    "queue_size": "REQUEST_LOGGING_QUEUE_SIZE",
+    "queue_overflow": "REQUEST_LOGGING_QUEUE_OVERFLOW",
+    "structured": "REQUEST_LOGGING_STRUCTURED",
+    "sample_rate": "REQUEST_LOGGING_SAMPLE_RATE",
+    "sample_always_log_errors": "REQUEST_LOGGING_SAMPLE_ALWAYS_LOG_ERRORS",
+    "rate_limit": "REQUEST_LOGGING_RATE_LIMIT",
+    "rate_limit_burst": "REQUEST_LOGGING_RATE_LIMIT_BURST",
+    "latency_histogram": "REQUEST_LOGGING_LATENCY_HISTOGRAM",
+    "log_streaming_responses": "REQUEST_LOGGING_LOG_STREAMING_RESPONSES",
+    "body_summarizers": "REQUEST_LOGGING_BODY_SUMMARIZERS",
+    "recorder_size": "REQUEST_LOGGING_RECORDER_SIZE",
+    "recorder_body_length": "REQUEST_LOGGING_RECORDER_BODY_LENGTH",
+    "tail_capture": "REQUEST_LOGGING_TAIL_CAPTURE",
+    "header_allowlist": "REQUEST_LOGGING_HEADER_ALLOWLIST",
+    "header_denylist": "REQUEST_LOGGING_HEADER_DENYLIST",
 }
-BINARY_REGEX = re.compile(r"(.+Content-Type:.*?)(\S+)/(\S+)(?:\r\n)*(.+)", re.S | re.I)
-BINARY_TYPES = ("image", "application")
 NO_LOGGING_ATTR = "no_logging"
 NO_LOGGING_MSG_ATTR = "no_logging_msg"
 NO_LOGGING_MSG = "No logging for this endpoint"
@@ -64,6 +139,7 @@ LOG_RESPONSE_DEFAULT_VALUE = getattr(
 )
 NO_RESPONSE_LOGGING_MSG_ATTR = "no_response_logging_msg"
 NO_RESPONSE_LOGGING_MSG = "No response logging for this endpoint"
+SAMPLE_RATE_ATTR = "sample_rate"
 
 LOGGER_NAME = getattr(
     settings,
@@ -72,22 +148,113 @@ LOGGER_NAME = getattr(
 )
 request_logger = logging.getLogger(LOGGER_NAME)
 
+LINE_SPLIT_REGEX = re.compile(r"\r?\n")
+
+# LogRecord attribute holding the fields of a structured exchange record
+STRUCTURED_RECORD_ATTR = "request_logging"
+
+# Attribute holding the RequestTimings of a request
+REQUEST_TIMINGS_ATTR = "request_logging_timings"
+
+# Attribute holding the body capture of a request, for process_exception
+REQUEST_CAPTURE_ATTR = "_request_logging_capture"
+
+# Attribute used to memoize whether a request is sampled, so its rate limit is consumed once
+REQUEST_SAMPLED_ATTR = "_request_logging_sampled"
+
+# Attribute holding the random number drawn for a request before the view, compared with its route's sample rate
+REQUEST_SAMPLE_ROLL_ATTR = "_request_logging_sample_roll"
+
+# Attribute holding the exception raised by the view once it has been logged
+REQUEST_EXCEPTION_ATTR = "_request_logging_exception"
+
+# Exceptions Django turns into 4xx responses, which are logged as any other response
+CLIENT_ERROR_EXCEPTIONS = (Http404, PermissionDenied, SuspiciousOperation)
+
+# Attribute used to memoize the resolved RoutePolicy on a request, so the URL is resolved at most once per request
+REQUEST_POLICY_ATTR = "_request_logging_policy"
+
+RoutePolicy = namedtuple(
+    "RoutePolicy",
+    [
+        "no_logging",
+        "no_logging_msg",
+        "log_headers",
+        "no_header_logging_msg",
+        "log_body",
+        "no_body_logging_msg",
+        "log_response",
+        "no_response_logging_msg",
+        "sample_rate",
+        "route_key",
+    ],
+)
+
+
+class RoutePolicyCache(object):
+    """
+    A bounded, thread-safe LRU cache mapping (urlconf, path, method) to a RoutePolicy.
+    A maxsize of 0 disables caching.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            policy = self._entries.pop(key, None)
+            if policy is not None:
+                self._entries[key] = policy
+            return policy
+
+    def set(self, key, policy):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = policy
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Logger(object):
+    def is_enabled_for(self, level):
+        # Logger.isEnabledFor caches its answer until the logging configuration changes
+        return request_logger.isEnabledFor(level)
 
-class Logger:
     def log(self, level, msg, logging_context):
+        if not self.is_enabled_for(level):
+            return
         args = logging_context["args"]
         kwargs = logging_context["kwargs"]
-        for line in re.split(r"\r?\n", str(msg)):
+        for line in LINE_SPLIT_REGEX.split(text_type(msg)):
             request_logger.log(level, line, *args, **kwargs)
 
     def log_error(self, level, msg, logging_context):
         self.log(level, msg, logging_context)
 
+    def log_record(self, level, msg, logging_context):
+        # Emits msg as a single record, line splitting is left to the formatter
+        if self.is_enabled_for(level):
+            request_logger.log(level, msg, *logging_context["args"], **logging_context["kwargs"])
+
 
 class ColourLogger(Logger):
     def __init__(self, log_colour, log_error_colour):
         self.log_colour = log_colour
         self.log_error_colour = log_error_colour
+        # The escape codes are built once instead of once per line by colorize()
+        self._prefixes = {colour: colorize(fg=colour, opts=("noreset",)) for colour in (log_colour, log_error_colour)}
+        self._suffix = colorize(opts=("reset",))
 
     def log(self, level, msg, logging_context):
         colour = self.log_error_colour if level >= logging.ERROR else self.log_colour
@@ -97,15 +264,40 @@ class ColourLogger(Logger):
         # Forces colour to be log_error_colour no matter what level is
         self._log(level, msg, self.log_error_colour, logging_context)
 
+    def log_record(self, level, msg, logging_context):
+        if not self.is_enabled_for(level):
+            return
+        colour = self.log_error_colour if level >= logging.ERROR else self.log_colour
+        super(ColourLogger, self).log_record(level, self._colorize(text_type(msg), colour), logging_context)
+
     def _log(self, level, msg, colour, logging_context):
+        if not self.is_enabled_for(level):
+            return
         args = logging_context["args"]
         kwargs = logging_context["kwargs"]
-        for line in re.split(r"\r?\n", str(msg)):
-            line = colorize(line, fg=colour)
-            request_logger.log(level, line, *args, **kwargs)
+        for line in LINE_SPLIT_REGEX.split(text_type(msg)):
+            request_logger.log(level, self._colorize(line, colour), *args, **kwargs)
 
+    def _colorize(self, text, colour):
+        return self._prefixes[colour] + text + self._suffix
 
-class LoggingMiddleware(object):
+
+def has_tty_handler(logger):
+    """
+    Returns whether any handler the records of logger reach writes to a TTY.
+    """
+    while isinstance(logger, logging.Logger):
+        for handler in logger.handlers:
+            isatty = getattr(getattr(handler, "stream", None), "isatty", None)
+            if isatty is not None and isatty():
+                return True
+        if not logger.propagate:
+            break
+        logger = logger.parent
+    return False
+
+
+class LoggingMiddleware(AsyncLoggingMixin):
     def __init__(self, get_response=None):
         # ensure that all the member references of LoggingMiddleware are read-only after construction
         # no other methods/properties invocations mutate these references so they can be safely read from any thread
@@ -113,6 +305,7 @@ class LoggingMiddleware(object):
         # https://stackoverflow.com/questions/10763641/is-this-django-middleware-thread-safe
         # https://blog.roseman.org.uk/2010/02/01/middleware-post-processing-django-gotcha/
         self.get_response = get_response
+        self._setup_async_mode()
 
         self.log_level = getattr(settings, SETTING_NAMES["log_level"], DEFAULT_LOG_LEVEL)
         self.http_4xx_log_level = getattr(settings, SETTING_NAMES["http_4xx_log_level"], DEFAULT_HTTP_4XX_LOG_LEVEL)
@@ -121,27 +314,68 @@ class LoggingMiddleware(object):
             raise ValueError(
                 "{} should be list. {} is not list.".format(SETTING_NAMES["sensitive_headers"], self.sensitive_headers)
             )
+        redaction_rules = {}
+        for rule in ("sensitive_query_params", "sensitive_body_keys", "sensitive_form_fields", "sensitive_patterns"):
+            redaction_rules[rule] = getattr(settings, SETTING_NAMES[rule], [])
+            if not isinstance(redaction_rules[rule], list):
+                raise ValueError(
+                    "{} should be list. {} is not list.".format(SETTING_NAMES[rule], redaction_rules[rule])
+                )
+        # Compiled once, the Redactor is only read afterwards
+        self.redactor = Redactor(
+            self.sensitive_headers,
+            redaction_rules["sensitive_query_params"],
+            redaction_rules["sensitive_body_keys"],
+            redaction_rules["sensitive_form_fields"],
+            redaction_rules["sensitive_patterns"],
+        )
+
+        header_allowlist = getattr(settings, SETTING_NAMES["header_allowlist"], None)
+        if header_allowlist is not None and not isinstance(header_allowlist, list):
+            raise ValueError(
+                "{} should be list. {} is not list.".format(SETTING_NAMES["header_allowlist"], header_allowlist)
+            )
+        header_denylist = getattr(settings, SETTING_NAMES["header_denylist"], [])
+        if not isinstance(header_denylist, list):
+            raise ValueError(
+                "{} should be list. {} is not list.".format(SETTING_NAMES["header_denylist"], header_denylist)
+            )
+        self.header_filter = HeaderFilter(header_allowlist, header_denylist, not IS_DJANGO_VERSION_GTE_3_2_0)
 
         for log_attr in ("log_level", "http_4xx_log_level"):
-            level = getattr(self, log_attr)
-            if level not in [
-                logging.NOTSET,
-                logging.DEBUG,
-                logging.INFO,
-                logging.WARNING,
-                logging.ERROR,
-                logging.CRITICAL,
-            ]:
-                raise ValueError("Unknown log level({}) in setting({})".format(level, SETTING_NAMES[log_attr]))
+            self._validate_log_level(getattr(self, log_attr), SETTING_NAMES[log_attr])
+
+        status_log_levels = getattr(settings, SETTING_NAMES["status_log_levels"], {})
+        self._validate_status_log_levels(status_log_levels, SETTING_NAMES["status_log_levels"])
+        route_log_levels = getattr(settings, SETTING_NAMES["route_log_levels"], {})
+        if not isinstance(route_log_levels, dict):
+            raise ValueError(
+                "{} should be dict. {} is not dict.".format(SETTING_NAMES["route_log_levels"], route_log_levels)
+            )
+        for route_levels in route_log_levels.values():
+            self._validate_status_log_levels(route_levels, SETTING_NAMES["route_log_levels"])
+        # Compiled once into lookup tables, the level of an exchange is then decided in O(1)
+        self.log_levels = LogLevelTable(
+            self.log_level,
+            self.http_4xx_log_level,
+            self.http_4xx_log_level == DEFAULT_HTTP_4XX_LOG_LEVEL,
+            status_log_levels,
+            route_log_levels,
+        )
 
         # TODO: remove deprecated legacy settings
         enable_colorize = getattr(settings, SETTING_NAMES["legacy_colorize"], None)
         if enable_colorize is None:
             enable_colorize = getattr(settings, SETTING_NAMES["colorize"], DEFAULT_COLORIZE)
 
+        if enable_colorize == COLORIZE_AUTO:
+            # Colours only help on terminals, files and log collectors get plain text
+            enable_colorize = has_tty_handler(request_logger)
         if not isinstance(enable_colorize, bool):
             raise ValueError(
-                "{} should be boolean. {} is not boolean.".format(SETTING_NAMES["colorize"], enable_colorize)
+                '{} should be boolean or "{}". {} is not.'.format(
+                    SETTING_NAMES["colorize"], COLORIZE_AUTO, enable_colorize
+                )
             )
 
         self.max_body_length = getattr(settings, SETTING_NAMES["max_body_length"], DEFAULT_MAX_BODY_LENGTH)
@@ -152,16 +386,450 @@ class LoggingMiddleware(object):
 
         self.logger = ColourLogger("cyan", "magenta") if enable_colorize else Logger()
 
+        self.sampler = self._get_sampler()
+
+        enable_latency_histogram = getattr(settings, SETTING_NAMES["latency_histogram"], DEFAULT_LATENCY_HISTOGRAM)
+        if not isinstance(enable_latency_histogram, bool):
+            raise ValueError(
+                "{} should be boolean. {} is not boolean.".format(
+                    SETTING_NAMES["latency_histogram"], enable_latency_histogram
+                )
+            )
+        self.latency_histogram = latency_histogram if enable_latency_histogram else None
+
+        self.log_streaming_responses = getattr(
+            settings, SETTING_NAMES["log_streaming_responses"], DEFAULT_LOG_STREAMING_RESPONSES
+        )
+        if not isinstance(self.log_streaming_responses, bool):
+            raise ValueError(
+                "{} should be boolean. {} is not boolean.".format(
+                    SETTING_NAMES["log_streaming_responses"], self.log_streaming_responses
+                )
+            )
+
+        self.tail_capture = getattr(settings, SETTING_NAMES["tail_capture"], DEFAULT_TAIL_CAPTURE)
+        if not isinstance(self.tail_capture, bool):
+            raise ValueError(
+                "{} should be boolean. {} is not boolean.".format(SETTING_NAMES["tail_capture"], self.tail_capture)
+            )
+
+        body_summarizers = getattr(settings, SETTING_NAMES["body_summarizers"], {})
+        if not isinstance(body_summarizers, dict):
+            raise ValueError(
+                "{} should be dict. {} is not dict.".format(SETTING_NAMES["body_summarizers"], body_summarizers)
+            )
+        self.summarizers = SummarizerRegistry(dict(DEFAULT_SUMMARIZERS, **body_summarizers))
+
+        recorder_size = getattr(settings, SETTING_NAMES["recorder_size"], DEFAULT_RECORDER_SIZE)
+        recorder_body_length = getattr(settings, SETTING_NAMES["recorder_body_length"], DEFAULT_RECORDER_BODY_LENGTH)
+        for setting, value in (("recorder_size", recorder_size), ("recorder_body_length", recorder_body_length)):
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(
+                    "{} should be a non-negative int. {} is not.".format(SETTING_NAMES[setting], value)
+                )
+        self.flight_recorder = None
+        if recorder_size:
+            # The recorder is shared by the process, so the inspection view and command can read it
+            flight_recorder.configure(recorder_size, recorder_body_length, self.redactor)
+            self.flight_recorder = flight_recorder
+
+        self.structured = getattr(settings, SETTING_NAMES["structured"], DEFAULT_STRUCTURED)
+        if not isinstance(self.structured, bool):
+            raise ValueError(
+                "{} should be boolean. {} is not boolean.".format(SETTING_NAMES["structured"], self.structured)
+            )
+
+        emitter = getattr(settings, SETTING_NAMES["emitter"], DEFAULT_EMITTER)
+        if emitter not in (EMITTER_SYNC, EMITTER_QUEUE):
+            raise ValueError("Unknown emitter({}) in setting({})".format(emitter, SETTING_NAMES["emitter"]))
+        # Under ASGI records are always queued, so handler I/O never runs on the event loop
+        if emitter == EMITTER_QUEUE or self.is_async:
+            queue_size = getattr(settings, SETTING_NAMES["queue_size"], DEFAULT_QUEUE_SIZE)
+            if not isinstance(queue_size, int):
+                raise ValueError(
+                    "{} should be int. {} is not int.".format(SETTING_NAMES["queue_size"], queue_size)
+                )
+            queue_overflow = getattr(settings, SETTING_NAMES["queue_overflow"], DEFAULT_QUEUE_OVERFLOW)
+            if queue_overflow not in OVERFLOW_POLICIES:
+                raise ValueError(
+                    "Unknown overflow policy({}) in setting({})".format(
+                        queue_overflow, SETTING_NAMES["queue_overflow"]
+                    )
+                )
+            if self.is_async and queue_overflow == OVERFLOW_BLOCK:
+                # Waiting for room would block the event loop, and with it every request it serves
+                queue_overflow = OVERFLOW_DROP_NEWEST
+            self.logger = QueueLogger(self.logger, queue_size, queue_overflow)
+
+        route_cache_size = getattr(settings, SETTING_NAMES["route_cache_size"], DEFAULT_ROUTE_CACHE_SIZE)
+        if not isinstance(route_cache_size, int):
+            raise ValueError(
+                "{} should be int. {} is not int.".format(SETTING_NAMES["route_cache_size"], route_cache_size)
+            )
+        # RoutePolicyCache is internally synchronized, so sharing it between threads is safe
+        self.route_cache = RoutePolicyCache(route_cache_size)
+
+        enable_policy_index = getattr(settings, SETTING_NAMES["policy_index"], DEFAULT_POLICY_INDEX)
+        if not isinstance(enable_policy_index, bool):
+            raise ValueError(
+                "{} should be boolean. {} is not boolean.".format(SETTING_NAMES["policy_index"], enable_policy_index)
+            )
+        self.policy_index_urlconfs = getattr(settings, SETTING_NAMES["policy_index_urlconfs"], [])
+        if not isinstance(self.policy_index_urlconfs, list):
+            raise ValueError(
+                "{} should be list. {} is not list.".format(
+                    SETTING_NAMES["policy_index_urlconfs"], self.policy_index_urlconfs
+                )
+            )
+        self.policy_index = self.build_policy_index() if enable_policy_index else None
+
+    def _validate_log_level(self, level, setting_name):
+        if level not in [
+            logging.NOTSET,
+            logging.DEBUG,
+            logging.INFO,
+            logging.WARNING,
+            logging.ERROR,
+            logging.CRITICAL,
+        ]:
+            raise ValueError("Unknown log level({}) in setting({})".format(level, setting_name))
+
+    def _validate_status_log_levels(self, status_log_levels, setting_name):
+        if not isinstance(status_log_levels, dict):
+            raise ValueError("{} should be dict. {} is not dict.".format(setting_name, status_log_levels))
+        status_classes = [status_class(status_code) for status_code in range(100, 600, 100)]
+        for status, level in status_log_levels.items():
+            if not isinstance(status, int) and status not in status_classes:
+                raise ValueError("Unknown status code({}) in setting({})".format(status, setting_name))
+            self._validate_log_level(level, setting_name)
+
+    def _get_sampler(self):
+        sample_rate = getattr(settings, SETTING_NAMES["sample_rate"], DEFAULT_SAMPLE_RATE)
+        if isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float)) or not 0 <= sample_rate <= 1:
+            raise ValueError(
+                "{} should be a number between 0 and 1. {} is not.".format(SETTING_NAMES["sample_rate"], sample_rate)
+            )
+        always_log_errors = getattr(
+            settings, SETTING_NAMES["sample_always_log_errors"], DEFAULT_SAMPLE_ALWAYS_LOG_ERRORS
+        )
+        if not isinstance(always_log_errors, bool):
+            raise ValueError(
+                "{} should be boolean. {} is not boolean.".format(
+                    SETTING_NAMES["sample_always_log_errors"], always_log_errors
+                )
+            )
+        rate_limit = getattr(settings, SETTING_NAMES["rate_limit"], DEFAULT_RATE_LIMIT)
+        rate_limit_burst = getattr(settings, SETTING_NAMES["rate_limit_burst"], rate_limit)
+        for setting, value in (("rate_limit", rate_limit), ("rate_limit_burst", rate_limit_burst)):
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+                raise ValueError(
+                    "{} should be a positive number. {} is not.".format(SETTING_NAMES[setting], value)
+                )
+        return Sampler(sample_rate, rate_limit, rate_limit_burst, always_log_errors)
+
     def __call__(self, request):
-        # cache in a local reference (instead of a member reference) and then pass in as argument
-        # in order to avoid other threads overwriting the original self.cached_request_body reference,
-        # is this done to preserve the original value in case it is mutated during the get_response invocation?
-        cached_request_body = request.body
-        response = self.get_response(request)
-        self.process_request(request, response, cached_request_body)
-        self.process_response(request, response)
+        if self.is_async:
+            return self.__acall__(request)
+
+        # keep the body capture in a local reference (instead of a member reference) and then pass the captured
+        # body in as argument, in order to avoid other threads overwriting it during the get_response invocation
+        timings = self._get_timings(request)
+        body_capture = self._start_exchange(request)
+        try:
+            response = self.get_response(request)
+        except Exception as e:
+            # Django didn't turn the exception into a response (e.g. DEBUG_PROPAGATE_EXCEPTIONS), so nothing logged it
+            self._log_exception(request, e, sys.exc_info())
+            raise
+        timings.view = perf_counter() - timings.started
+        sampled, cached_request_body = self._finish_exchange(request, body_capture)
+        if sampled or self._is_sampled_error(response):
+            self._log_exchange(request, response, cached_request_body if sampled else None)
+        else:
+            self._observe_latency(request, response)
+        self._record_exchange(request, response, cached_request_body)
         return response
 
+    def _start_exchange(self, request):
+        """
+        Starts capturing the request body right before the view is called, and returns the body capture (also kept
+        on the request for process_exception). Nothing is resolved yet: Django resolves the view, possibly with a
+        request.urlconf set by later middleware, and the logging policy is looked up from its resolver_match.
+
+        The global sample rate is applied here, so the body of a request sampled out is never captured, unless the
+        flight recorder keeps it. Route sample rates are applied once the route is known, with the same roll.
+        """
+        roll, kept = self.sampler.presample()
+        setattr(request, REQUEST_SAMPLE_ROLL_ATTR, roll)
+        body_capture = self._start_body_capture(request) if kept or self.flight_recorder else None
+        setattr(request, REQUEST_CAPTURE_ATTR, body_capture)
+        self._get_timings(request).started = perf_counter()
+        return body_capture
+
+    def _finish_exchange(self, request, body_capture):
+        """
+        Decides, once the view has run, whether the request is logged. Returns (sampled, captured body), the body
+        being None when it's empty or isn't logged nor recorded.
+        """
+        sampled = self._should_sample(request)
+        if not (sampled or self.flight_recorder):
+            return sampled, None
+        return sampled, self._finish_body_capture(request, body_capture)
+
+    def _get_timings(self, request):
+        timings = getattr(request, REQUEST_TIMINGS_ATTR, None)
+        if timings is None:
+            timings = RequestTimings()
+            setattr(request, REQUEST_TIMINGS_ATTR, timings)
+        return timings
+
+    def _timed(self, request, stage, func, *args):
+        start = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self._get_timings(request).add(stage, perf_counter() - start)
+
+    def _observe_latency(self, request, response):
+        if self.latency_histogram is not None:
+            policy = self._get_policy(request)
+            self.latency_histogram.observe(policy.route_key, response.status_code, self._get_timings(request))
+
+    def _record_exchange(self, request, response, cached_request_body):
+        if self.flight_recorder is None:
+            return
+        policy = self._get_policy(request)
+        if policy.no_logging:
+            return
+        response_body = None
+        if policy.log_response and not response.streaming and self._is_logged_content_type(response):
+            response_body = self._read_response_body(response)
+        self.flight_recorder.record(
+            request.method,
+            request.get_full_path(),
+            response.status_code,
+            self._get_timings(request).view,
+            cached_request_body,
+            response_body,
+        )
+
+    def _should_sample(self, request):
+        """
+        Decides whether this request is logged, once per request. Routes without logging are "sampled" so the
+        usual skip message is still emitted without consuming their rate limit.
+        """
+        sampled = getattr(request, REQUEST_SAMPLED_ATTR, None)
+        if sampled is None:
+            policy = self._get_policy(request)
+            sampled = policy.no_logging or self.sampler.should_log(
+                policy.route_key, policy.sample_rate, getattr(request, REQUEST_SAMPLE_ROLL_ATTR, None)
+            )
+            setattr(request, REQUEST_SAMPLED_ATTR, sampled)
+        return sampled
+
+    def _is_sampled_error(self, response):
+        # Requests that were sampled out are still logged, without their body, if they failed
+        return self.sampler.always_log_errors and response.status_code >= 400
+
+    def _log_exchange(self, request, response, cached_request_body):
+        start = perf_counter()
+        try:
+            if not self.logger.is_enabled_for(self._get_log_levels(request, response).highest):
+                # None of the records would be emitted, the skip message of routes without logging aside
+                if not self._get_policy(request).no_logging:
+                    return
+            if self._is_summary_only(request, response):
+                self._log_summary(request, response)
+            elif self.structured:
+                self._log_structured(request, response, cached_request_body)
+            else:
+                self.process_request(request, response, cached_request_body)
+                self.process_response(request, response)
+        finally:
+            self._get_timings(request).add("logging", perf_counter() - start)
+            # Also observed when the level of the logger skips every record
+            self._observe_latency(request, response)
+
+    def _is_summary_only(self, request, response):
+        if self._get_policy(request).no_logging:
+            return False
+        if getattr(request, REQUEST_EXCEPTION_ATTR, None) is not None:
+            # The request was already logged together with the exception the view raised
+            return True
+        # With tail capture, the details of a request are only logged when it failed
+        return self.tail_capture and response.status_code < 400
+
+    def process_exception(self, request, exception):
+        """
+        Logs the request of a view that raised. Django logs the traceback to django.request itself when it turns the
+        exception into a 500 response, so it is only attached when exceptions are propagated.
+        """
+        if not isinstance(exception, CLIENT_ERROR_EXCEPTIONS):
+            self._log_exception(request, exception, sys.exc_info() if settings.DEBUG_PROPAGATE_EXCEPTIONS else None)
+
+    def _log_exception(self, request, exception, exc_info=None):
+        """
+        Emits the request, its captured body, the time the view ran for and the type of the exception as a single
+        record, once per request.
+        """
+        if getattr(request, REQUEST_EXCEPTION_ATTR, None) is not None:
+            return
+        setattr(request, REQUEST_EXCEPTION_ATTR, exception)
+        sampled = self._should_sample(request)
+        if self._get_policy(request).no_logging or not (sampled or self.sampler.always_log_errors):
+            return
+        timings = self._get_timings(request)
+        timings.view = perf_counter() - timings.started
+        level = self.log_levels.get(request.path, 500).response_data
+        if not self.logger.is_enabled_for(level):
+            return
+
+        start = perf_counter()
+        try:
+            fields = {
+                "method": request.method,
+                "path": self._get_full_path(request),
+                "duration": timings.view,
+                "exception": type(exception).__name__,
+            }
+            message = "{method} {path} - {exception} ({duration:.3f}s)".format(**fields)
+            cached_request_body = None
+            if sampled:
+                cached_request_body = self._finish_body_capture(request, getattr(request, REQUEST_CAPTURE_ATTR, None))
+            log_body, _ = self._should_log_body(request)
+            body = None
+            if log_body and cached_request_body is not None:
+                body = self._timed(request, "body", self._chunked_to_max, cached_request_body)
+
+            logging_context = self._get_logging_context(request, None)
+            if exc_info is not None:
+                logging_context["kwargs"]["exc_info"] = exc_info
+            if self.structured:
+                fields["request_body"] = self._redact_body(body)
+                self._log_structured_record(request, None, level, message, fields)
+                return
+            lines = [message]
+            if body is not None:
+                multipart_boundary = None
+                if isinstance(cached_request_body, bytes):
+                    multipart_boundary = parse_boundary(request.META.get("CONTENT_TYPE", ""))
+                if multipart_boundary:
+                    lines += self._summarize_multipart(cached_request_body, len(body), multipart_boundary)
+                else:
+                    lines.append(self._summarize_request_body(request, body, cached_request_body))
+            # A body ending with a newline would show up as a blank line
+            self.logger.log_record(level, "\n".join(lines).rstrip("\r\n"), logging_context)
+        finally:
+            timings.add("logging", perf_counter() - start)
+
+    def _log_summary(self, request, response):
+        """
+        Emits only the "METHOD path - status" line of the exchange, the captured body is dropped unformatted.
+        """
+        level = self._get_log_levels(request, response).response
+        if not self.logger.is_enabled_for(level):
+            return
+        message = "{} {} - {}".format(request.method, self._get_full_path(request), response.status_code)
+        if not self.structured:
+            self.logger.log(level, message, self._get_logging_context(request, response))
+            return
+        timings = self._get_timings(request)
+        fields = {
+            "method": request.method,
+            "path": self._get_full_path(request),
+            "status": response.status_code,
+            "duration": timings.view,
+            "timings": timings.as_dict(),
+        }
+        self._log_structured_record(request, response, level, message, fields)
+
+    def _log_structured(self, request, response, cached_request_body):
+        """
+        Emits the whole exchange as one record. The message is the one line "METHOD path - status" summary and
+        the request/response details are attached as fields of the STRUCTURED_RECORD_ATTR record attribute.
+        """
+        skip_logging, because = self._should_log_route(request)
+        if skip_logging:
+            if because is not None:
+                self._skip_logging_request(request, because)
+            return
+        levels = self._get_log_levels(request, response)
+        level = max(levels.response, levels.request_data)
+        if not self.logger.is_enabled_for(level):
+            return
+
+        log_headers, _ = self._should_log_headers(request)
+        log_body, _ = self._should_log_body(request)
+        log_response, _ = self._should_log_response(request)
+        timings = self._get_timings(request)
+        fields = {
+            "method": request.method,
+            "path": self._get_full_path(request),
+            "status": response.status_code,
+            "duration": timings.view,
+            "request_headers": self._get_request_headers(request) if log_headers else None,
+            "request_body": (
+                self._redact_body(self._timed(request, "body", self._chunked_to_max, cached_request_body))
+                if cached_request_body is not None
+                else None
+            ),
+            "response_headers": self._get_response_headers(response) if log_response else None,
+            "response_body": self._redact_body(self._get_response_body(response)) if log_response else None,
+        }
+        # Emitting this very record is not accounted for yet
+        fields["timings"] = timings.as_dict()
+
+        message = "{method} {path} - {status}".format(**fields)
+        if log_response and self._should_tee_stream(response):
+            fields["response_body"] = None
+
+            def log_stream(body, total_length, duration):
+                stream_fields = dict(
+                    fields, response_body=self._redact_body(body), stream_length=total_length, stream_duration=duration
+                )
+                self._log_structured_record(request, response, level, message + " (stream finished)", stream_fields)
+
+            self._tee_stream(response, log_stream)
+
+        self._log_structured_record(request, response, level, message, fields)
+
+    def _log_structured_record(self, request, response, level, message, fields):
+        logging_context = self._get_logging_context(request, response)
+        logging_context["kwargs"].setdefault("extra", {})[STRUCTURED_RECORD_ATTR] = fields
+        self.logger.log_record(level, message, logging_context)
+
+    def _start_body_capture(self, request):
+        """
+        Returns an object from which _finish_body_capture can recover the first max_body_length bytes of the body,
+        or None when there is nothing to capture. request.body is never forced here: if the view hasn't already
+        been given the body, the input stream is wrapped so the view can still stream it (e.g. request.read()).
+        """
+        stream = getattr(request, "_stream", None)
+        if hasattr(request, "_body") or stream is None:
+            return request
+        if getattr(request, "_read_started", False):
+            # Some earlier code already consumed the stream, there is nothing left to capture
+            return None
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+        tee = RequestBodyTee(stream, self.max_body_length, content_length)
+        request._stream = tee
+        return tee
+
+    def _finish_body_capture(self, request, body_capture):
+        if body_capture is None:
+            return None
+        skip_logging, _ = self._should_log_route(request)
+        log_body, _ = self._should_log_body(request)
+        if skip_logging or not log_body:
+            # Whatever the view read went through the capture untouched, the rest of the body isn't read
+            return None
+        body = request.body if body_capture is request else body_capture.finish()
+        # A request without a body (e.g. a GET) has no body record
+        return body or None
+
     def process_request(self, request, response, cached_request_body):
         skip_logging, because = self._should_log_route(request)
         if skip_logging:
@@ -182,8 +850,9 @@ class LoggingMiddleware(object):
         except Resolver404:
             return False, None
 
-        method = request.method.lower()
-        view = route_match.func
+        return self._get_view_func(route_match.func, request.method.lower())
+
+    def _get_view_func(self, view, method):
         func = view
         # This is for "django rest framework"
         if hasattr(view, "cls"):
@@ -200,32 +869,93 @@ class LoggingMiddleware(object):
 
         return func
 
+    def build_policy_index(self):
+        """
+        Walks ROOT_URLCONF and REQUEST_LOGGING_POLICY_INDEX_URLCONFS and returns a PolicyIndex of their views.
+        """
+        urlconfs = [settings.ROOT_URLCONF] if getattr(settings, "ROOT_URLCONF", None) else []
+        urlconfs += self.policy_index_urlconfs
+        return build_policy_index(
+            urlconfs, lambda view, method: self._policy_for_func(self._get_view_func(view, method))
+        )
+
+    def rebuild_policy_index(self):
+        """
+        Rebuilds the policy index, e.g. after urlconfs changed in tests. Returns the new index.
+        """
+        # Swapping the reference is atomic, so requests in flight keep reading a consistent index
+        self.policy_index = self.build_policy_index()
+        self.route_cache.clear()
+        return self.policy_index
+
+    def _get_policy(self, request):
+        """
+        Returns the RoutePolicy for this request. The policy is computed at most once per request and hot
+        (urlconf, path, method) combinations are served from the route cache without calling resolve().
+        """
+        policy = getattr(request, REQUEST_POLICY_ATTR, None)
+        if policy is not None:
+            return policy
+        return self._timed(request, "resolve", self._resolve_policy, request)
+
+    def _resolve_policy(self, request):
+        urlconf = getattr(request, "urlconf", None) or get_urlconf()
+        route_match = getattr(request, "resolver_match", None)
+        if self.policy_index is not None and getattr(route_match, "route", None) is not None:
+            policy = self.policy_index.lookup(urlconf, route_match.route, request.method)
+            if policy is not None:
+                setattr(request, REQUEST_POLICY_ATTR, policy)
+                return policy
+
+        key = (urlconf_name(urlconf), request.path, request.method)
+        policy = self.route_cache.get(key)
+        if policy is None:
+            if route_match is not None:
+                # Django already resolved the view
+                func = self._get_view_func(route_match.func, request.method.lower())
+            else:
+                func = self._get_func(request)
+            policy = self._policy_for_func(func)
+            self.route_cache.set(key, policy)
+
+        setattr(request, REQUEST_POLICY_ATTR, policy)
+        return policy
+
+    def _policy_for_func(self, func):
+        return RoutePolicy(
+            no_logging=getattr(func, NO_LOGGING_ATTR, NO_LOGGING_DEFAULT_VALUE),
+            no_logging_msg=getattr(func, NO_LOGGING_MSG_ATTR, None),
+            log_headers=getattr(func, LOG_HEADERS_ATTR, LOG_HEADERS_DEFAULT_VALUE),
+            no_header_logging_msg=getattr(func, NO_HEADER_LOGGING_MSG_ATTR, None),
+            log_body=getattr(func, LOG_BODY_ATTR, LOG_BODY_DEFAULT_VALUE),
+            no_body_logging_msg=getattr(func, NO_BODY_LOGGING_MSG_ATTR, None),
+            log_response=getattr(func, LOG_RESPONSE_ATTR, LOG_RESPONSE_DEFAULT_VALUE),
+            no_response_logging_msg=getattr(func, NO_RESPONSE_LOGGING_MSG_ATTR, None),
+            sample_rate=getattr(func, SAMPLE_RATE_ATTR, None),
+            # Identifies the view handler, e.g. for per-route rate limits
+            route_key="{}.{}".format(
+                getattr(func, "__module__", None), getattr(func, "__qualname__", getattr(func, "__name__", None))
+            ),
+        )
+
     def _should_log_route(self, request):
-        func = self._get_func(request)
-        no_logging = getattr(func, NO_LOGGING_ATTR, NO_LOGGING_DEFAULT_VALUE)
-        no_logging_msg = getattr(func, NO_LOGGING_MSG_ATTR, None)
-        return no_logging, no_logging_msg
+        policy = self._get_policy(request)
+        return policy.no_logging, policy.no_logging_msg
 
     def _should_log_headers(self, request):
-        func = self._get_func(request)
-        header_logging = getattr(func, LOG_HEADERS_ATTR, LOG_HEADERS_DEFAULT_VALUE)
-        no_header_logging_msg = getattr(func, NO_HEADER_LOGGING_MSG_ATTR, None)
-        return header_logging, no_header_logging_msg
+        policy = self._get_policy(request)
+        return policy.log_headers, policy.no_header_logging_msg
 
     def _should_log_body(self, request):
-        func = self._get_func(request)
-        body_logging = getattr(func, LOG_BODY_ATTR, LOG_BODY_DEFAULT_VALUE)
-        no_body_logging_msg = getattr(func, NO_BODY_LOGGING_MSG_ATTR, None)
-        return body_logging, no_body_logging_msg
+        policy = self._get_policy(request)
+        return policy.log_body, policy.no_body_logging_msg
 
     def _should_log_response(self, request):
-        func = self._get_func(request)
-        response_logging = getattr(func, LOG_RESPONSE_ATTR, LOG_RESPONSE_DEFAULT_VALUE)
-        no_response_logging_msg = getattr(func, NO_RESPONSE_LOGGING_MSG_ATTR, None)
-        return response_logging, no_response_logging_msg
+        policy = self._get_policy(request)
+        return policy.log_response, policy.no_response_logging_msg
 
     def _skip_logging_request(self, request, reason):
-        method_path = "{} {}".format(request.method, request.get_full_path())
+        method_path = "{} {}".format(request.method, self._get_full_path(request))
         no_log_context = {
             "args": (),
             "kwargs": {"extra": {"no_logging": reason}},
@@ -233,21 +963,21 @@ class LoggingMiddleware(object):
         self.logger.log(logging.INFO, method_path + " (not logged because '" + reason + "')", no_log_context)
 
     def _log_request(self, request, response, cached_request_body):
-        method_path = "{} {}".format(request.method, request.get_full_path())
+        method_path = "{} {}".format(request.method, self._get_full_path(request))
         logging_context = self._get_logging_context(request, None)
 
-        # Determine log level depending on response status
-        log_level = self.log_level
-        if response is not None:
-            if response.status_code in range(400, 500):
-                log_level = self.http_4xx_log_level
-            elif response.status_code in range(500, 600):
-                log_level = logging.ERROR
+        levels = self._get_log_levels(request, response)
+        log_level = levels.request_data
 
-        self.logger.log(logging.INFO, method_path, logging_context)
+        self.logger.log(levels.request, method_path, logging_context)
         self._log_request_headers(request, logging_context, log_level)
         self._log_request_body(request, logging_context, log_level, cached_request_body)
 
+    def _get_log_levels(self, request, response):
+        # Levels of the exchange depending on response status and request path
+        status_code = response.status_code if response is not None else 200
+        return self.log_levels.get(request.path, status_code)
+
     def _log_request_headers(self, request, logging_context, log_level):
         log_headers, because = self._should_log_headers(request)
         if not log_headers:
@@ -256,19 +986,26 @@ class LoggingMiddleware(object):
                     logging.INFO, "no headers logged", {"args": {}, "kwargs": {"extra": {"no_header_logging": because}}}
                 )
             return None
+        if not self.logger.is_enabled_for(log_level):
+            return None
 
-        if IS_DJANGO_VERSION_GTE_3_2_0:
-            headers = {k: v if k not in self.sensitive_headers else "*****" for k, v in request.headers.items()}
-        else:
-            headers = {
-                k: v if k not in self.sensitive_headers else "*****"
-                for k, v in request.META.items()
-                if k.startswith("HTTP_")
-            }
-
+        headers = self._get_request_headers(request)
         if headers:
             self.logger.log(log_level, headers, logging_context)
 
+    def _get_request_headers(self, request):
+        return self._timed(request, "headers", self._build_request_headers, request)
+
+    def _build_request_headers(self, request):
+        if self.header_filter.active:
+            return self.redactor.redact_headers(self.header_filter.request_headers(request))
+        if IS_DJANGO_VERSION_GTE_3_2_0:
+            return self.redactor.redact_headers(request.headers.items())
+        return self.redactor.redact_headers((k, v) for k, v in request.META.items() if k.startswith("HTTP_"))
+
+    def _get_full_path(self, request):
+        return self.redactor.redact_query(request.get_full_path())
+
     def _log_request_body(self, request, logging_context, log_level, cached_request_body):
         log_body, because = self._should_log_body(request)
         if not log_body:
@@ -277,18 +1014,45 @@ class LoggingMiddleware(object):
                     logging.INFO, "no body logged", {"args": {}, "kwargs": {"extra": {"log_body": because}}}
                 )
             return None
+        if not self.logger.is_enabled_for(log_level):
+            return None
 
         if cached_request_body is not None:
-            content_type = request.META.get("CONTENT_TYPE", "")
-            is_multipart = content_type.startswith("multipart/form-data")
-            if is_multipart:
-                multipart_boundary = "--" + content_type[30:]  # First 30 characters are "multipart/form-data; boundary="
-                self._log_multipart(self._chunked_to_max(cached_request_body), logging_context, log_level, multipart_boundary)
+            body = self._timed(request, "body", self._chunked_to_max, cached_request_body)
+            multipart_boundary = None
+            if isinstance(cached_request_body, bytes):
+                multipart_boundary = parse_boundary(request.META.get("CONTENT_TYPE", ""))
+            if multipart_boundary:
+                parts = self._timed(
+                    request, "multipart", self._summarize_multipart, cached_request_body, len(body), multipart_boundary
+                )
+                for part in parts:
+                    self.logger.log(log_level, part, logging_context)
             else:
-                self.logger.log(log_level, self._chunked_to_max(cached_request_body), logging_context)
+                summary = self._timed(request, "body", self._summarize_request_body, request, body, cached_request_body)
+                self.logger.log(log_level, summary, logging_context)
+
+    def _summarize_request_body(self, request, body, cached_request_body):
+        """
+        Returns the request body as summarized for its content type. Bodies without a summarizer are logged as their
+        media type and size, like responses, or decoded as text when they have no content type.
+        """
+        size = len(cached_request_body)
+        try:
+            # The captured body may be only the first max_body_length bytes of the body
+            size = max(size, int(request.META.get("CONTENT_LENGTH") or 0))
+        except ValueError:
+            pass
+        content_type = request.META.get("CONTENT_TYPE", "")
+        summary = self.summarizers.summarize(content_type, body, size)
+        if summary is None:
+            media_type = media_type_of(content_type)
+            # e.g. application/octet-stream or application/pdf, which would only decode to garbage
+            summary = "({}: {} bytes)".format(media_type, size) if media_type else self._decode_body(body)
+        return self.redactor.redact_text(summary)
 
     def process_response(self, request, response):
-        resp_log = "{} {} - {}".format(request.method, request.get_full_path(), response.status_code)
+        resp_log = "{} {} - {}".format(request.method, self._get_full_path(request), response.status_code)
         skip_logging, because = self._should_log_route(request)
         if skip_logging:
             if because is not None:
@@ -305,20 +1069,12 @@ class LoggingMiddleware(object):
             return response
         logging_context = self._get_logging_context(request, response)
 
-        if response.status_code in range(400, 500):
-            if self.http_4xx_log_level == DEFAULT_HTTP_4XX_LOG_LEVEL:
-                # default, log as per 5xx
-                self.logger.log_error(logging.INFO, resp_log, logging_context)
-                self._log_resp(logging.ERROR, response, logging_context)
-            else:
-                self.logger.log(self.http_4xx_log_level, resp_log, logging_context)
-                self._log_resp(self.log_level, response, logging_context)
-        elif response.status_code in range(500, 600):
-            self.logger.log_error(logging.INFO, resp_log, logging_context)
-            self._log_resp(logging.ERROR, response, logging_context)
+        levels = self._get_log_levels(request, response)
+        if levels.error:
+            self.logger.log_error(levels.response, resp_log, logging_context)
         else:
-            self.logger.log(logging.INFO, resp_log, logging_context)
-            self._log_resp(self.log_level, response, logging_context)
+            self.logger.log(levels.response, resp_log, logging_context)
+        self._log_resp(levels.response_data, response, logging_context)
 
         return response
 
@@ -332,47 +1088,143 @@ class LoggingMiddleware(object):
             "kwargs": {"extra": {"request": request, "response": response}},
         }
 
-    def _log_multipart(self, body, logging_context, log_level, multipart_boundary):
+    def _summarize_multipart(self, body, end, multipart_boundary):
         """
-        Splits multipart body into parts separated by "boundary", then matches each part to BINARY_REGEX
-        which searches for existence of "Content-Type" and capture of what type is this part.
-        If it is an image or an application replace that content with "(binary data)" string.
-        This function will log "(multipart/form)" if body can't be decoded by utf-8.
+        Returns one summary per part of the first `end` bytes of a multipart body: its name, filename, content
+        type and size, followed by the decoded content for text parts and "(binary data)" for the others.
         """
-        try:
-            body_str = body.decode()
-        except UnicodeDecodeError:
-            self.logger.log(log_level, "(multipart/form)", logging_context)
-            return
+        return [format_part(self._redact_part(part)) for part in iter_parts(body, multipart_boundary, end)]
 
-        parts = body_str.split(multipart_boundary)
-        last = len(parts) - 1
-        for i, part in enumerate(parts):
-            if "Content-Type:" in part:
-                match = BINARY_REGEX.search(part)
-                if match and match.group(2) in BINARY_TYPES and not match.group(4) in ("", "\r\n"):
-                    part = match.expand(r"\1\2/\3\r\n\r\n(binary data)\r\n")
+    def _redact_part(self, part):
+        if part.preview is None:
+            return part
+        if self.redactor.is_sensitive_field(part.name):
+            return part._replace(preview=REDACTED)
+        return part._replace(preview=self.redactor.redact_text(part.preview))
 
-            if i != last:
-                part = part + multipart_boundary
+    def _log_resp(self, level, response, logging_context):
+        if not self.logger.is_enabled_for(level):
+            return
+        if not self._is_logged_content_type(response):
+            # Neither headers nor body of other content types are logged, only what and how big the body is
+            self.logger.log(level, self._summarize_response_size(response), logging_context)
+        else:
+            self.logger.log(level, self._get_response_headers(response), logging_context)
+            if self._should_tee_stream(response):
 
-            self.logger.log(log_level, part, logging_context)
+                def log_stream(body, total_length, duration):
+                    self.logger.log(level, self._summarize_response_body(response, body, total_length), logging_context)
+                    self.logger.log(
+                        level, "(data_stream: {} bytes in {:.3f}s)".format(total_length, duration), logging_context
+                    )
 
-    def _log_resp(self, level, response, logging_context):
-        if re.match("^application/json", response.get("Content-Type", ""), re.I):
-            if IS_DJANGO_VERSION_GTE_3_2_0:
-                response_headers = response.headers
-            else:
-                response_headers = response._headers
-            self.logger.log(level, response_headers, logging_context)
-            if response.streaming:
-                # There's a chance that if it's streaming it's because large and it might hit
-                # the max_body_length very often. Not to mention that StreamingHttpResponse
-                # documentation advises to iterate only once on the content.
-                # So the idea here is to just _not_ log it.
-                self.logger.log(level, "(data_stream)", logging_context)
+                self._tee_stream(response, log_stream)
             else:
-                self.logger.log(level, self._chunked_to_max(response.content), logging_context)
+                body = self._get_response_body(response)
+                if not response.streaming:
+                    body = self._summarize_response_body(response, body, self._get_response_size(response))
+                self.logger.log(level, body, logging_context)
+
+    def _should_tee_stream(self, response):
+        return self.log_streaming_responses and response.streaming and self._is_logged_content_type(response)
+
+    def _tee_stream(self, response, on_finish):
+        """
+        Replaces the streaming content of the response with a tee that calls on_finish(body, total_length,
+        duration) with the first max_body_length bytes once the stream has been consumed or closed.
+        """
+        if getattr(response, "is_async", False):
+            response.streaming_content = AsyncStreamingContentTee(
+                response.streaming_content, self.max_body_length, on_finish
+            )
+        else:
+            response.streaming_content = StreamingContentTee(
+                iter(response.streaming_content), self.max_body_length, on_finish
+            )
+
+    def _is_logged_content_type(self, response):
+        return self.summarizers.get(response.get("Content-Type", ""))[1] is not None
+
+    def _summarize_response_body(self, response, body, size):
+        return self.redactor.redact_text(self.summarizers.summarize(response.get("Content-Type", ""), body, size))
+
+    def _redact_body(self, body):
+        """
+        Returns a body of a structured record as is, or as redacted text when body redaction rules are set.
+        """
+        if body is None or self.redactor.body_regex is None:
+            return body
+        return self.redactor.redact_text(self._decode_body(body))
+
+    def _get_response_headers(self, response):
+        # Always a copy, records may be emitted later on another thread while the response is still being changed
+        if self.header_filter.active:
+            return self.redactor.redact_headers(self.header_filter.response_headers(response).items())
+        if IS_DJANGO_VERSION_GTE_3_2_0:
+            return self.redactor.redact_headers(response.headers.items())
+        return self.redactor.redact_headers(response._headers.values())
+
+    def _get_response_body(self, response):
+        if not self._is_logged_content_type(response):
+            return None
+        if response.streaming:
+            # There's a chance that if it's streaming it's because large and it might hit
+            # the max_body_length very often. Not to mention that StreamingHttpResponse
+            # documentation advises to iterate only once on the content.
+            # So the idea here is to just _not_ log it.
+            return "(data_stream)"
+        return self._read_response_body(response)
+
+    def _read_response_body(self, response):
+        """
+        Returns the first max_body_length bytes of a (non streaming) response body. They are read straight from the
+        chunks the response holds, rather than from response.content which joins all of them into a new bytes.
+        """
+        container = getattr(response, "_container", None)
+        if not isinstance(container, list):
+            return self._chunked_to_max(response.content)
+        if len(container) == 1:
+            return self._chunked_to_max(container[0])
+        chunks = []
+        remaining = self.max_body_length
+        for chunk in container:
+            if remaining <= 0:
+                break
+            chunks.append(chunk[:remaining])
+            remaining -= len(chunks[-1])
+        return memoryview(b"".join(chunks))
+
+    def _get_response_size(self, response):
+        """
+        Returns the length of the response body, or None for streaming responses without a Content-Length (files
+        served by FileResponse usually have one, so their size is known without touching the file).
+        """
+        if response.streaming:
+            try:
+                return int(response.get("Content-Length"))
+            except (TypeError, ValueError):
+                return None
+        container = getattr(response, "_container", None)
+        if isinstance(container, list):
+            return sum(len(chunk) for chunk in container)
+        return len(response.content)
+
+    def _summarize_response_size(self, response):
+        media_type = media_type_of(response.get("Content-Type", "")) or "unknown type"
+        size = self._get_response_size(response)
+        if size is None:
+            return "({}: data_stream)".format(media_type)
+        return "({}: {} bytes)".format(media_type, size)
 
     def _chunked_to_max(self, msg):
+        if isinstance(msg, bytes):
+            # Slicing a memoryview doesn't copy the body
+            return memoryview(msg)[0:self.max_body_length]
         return msg[0:self.max_body_length]
+
+    def _decode_body(self, body):
+        """
+        Decodes a (truncated) body as utf-8 text to be logged. A multibyte character cut by the truncation is
+        dropped instead of being treated as an error. Anything that isn't bytes-like is returned as is.
+        """
+        return decode_text(body, final=len(body) < self.max_body_length)
@@ -0,0 +1,113 @@
+import re
+from collections import namedtuple
+
+BINARY_TYPES = ("image", "application", "audio", "video")
+HEADER_PARAM_REGEX = re.compile(r';\s*([^\s=;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+
+MultipartPart = namedtuple("MultipartPart", ["name", "filename", "content_type", "size", "truncated", "preview"])
+
+
+def parse_header_params(value):
+    """
+    Splits a header value like 'form-data; name="file"; filename="a;b.txt"' into its main value and a dict of
+    lower-cased parameter names to unquoted values.
+    """
+    main, _, rest = value.partition(";")
+    params = {}
+    for match in HEADER_PARAM_REGEX.finditer(";" + rest):
+        param_value = match.group(2).strip()
+        if param_value.startswith('"'):
+            param_value = re.sub(r"\\(.)", r"\1", param_value[1:-1])
+        params[match.group(1).lower()] = param_value
+    return main.strip().lower(), params
+
+
+def parse_boundary(content_type):
+    """
+    Returns the boundary of a multipart Content-Type header as bytes, or None if it isn't a multipart type.
+    """
+    media_type, params = parse_header_params(content_type)
+    if not media_type.startswith("multipart/") or not params.get("boundary"):
+        return None
+    return params["boundary"].encode("latin-1")
+
+
+def _parse_part_headers(raw_headers):
+    headers = {}
+    for line in raw_headers.decode("latin-1").split("\r\n"):
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def iter_parts(data, boundary, end=None):
+    """
+    Scans a (possibly truncated) multipart body in a single pass and yields a MultipartPart per part. Only part
+    headers are decoded: binary payloads are measured and skipped, text payloads are decoded with their charset
+    as the preview. `end` limits the scan to data[:end] without copying data.
+    The size of a part cut by the truncation is the number of bytes seen, and its `truncated` flag is set.
+    """
+    end = len(data) if end is None else end
+    delimiter = b"--" + boundary
+    pos = data.find(delimiter, 0, end)
+    while pos >= 0:
+        pos += len(delimiter)
+        if data.startswith(b"--", pos, end):
+            # closing delimiter
+            return
+        line_end = data.find(b"\r\n", pos, end)
+        if line_end < 0:
+            return
+        headers_start = line_end + 2
+        if data.startswith(b"\r\n", headers_start, end):
+            # a part without headers
+            headers_end = content_start = headers_start + 2
+        else:
+            headers_end = data.find(b"\r\n\r\n", headers_start, end)
+            if headers_end < 0:
+                return
+            content_start = headers_end + 4
+        headers = _parse_part_headers(data[headers_start:headers_end])
+
+        next_pos = data.find(b"\r\n" + delimiter, content_start, end)
+        truncated = next_pos < 0
+        content_end = end if truncated else next_pos
+
+        _, disposition = parse_header_params(headers.get("content-disposition", ""))
+        content_type, content_type_params = parse_header_params(headers.get("content-type", "text/plain"))
+        preview = None
+        if content_type.partition("/")[0] not in BINARY_TYPES:
+            charset = content_type_params.get("charset", "utf-8")
+            try:
+                preview = data[content_start:content_end].decode(charset, "replace")
+            except LookupError:
+                preview = data[content_start:content_end].decode("utf-8", "replace")
+        yield MultipartPart(
+            name=disposition.get("name"),
+            filename=disposition.get("filename"),
+            content_type=headers.get("content-type"),
+            size=content_end - content_start,
+            truncated=truncated,
+            preview=preview,
+        )
+
+        pos = -1 if truncated else next_pos + 2
+
+
+def format_part(part):
+    """
+    Returns a one line summary of a part, followed by its text preview if any.
+    """
+    summary = []
+    if part.name is not None:
+        summary.append('name="{}"'.format(part.name))
+    if part.filename is not None:
+        summary.append('filename="{}"'.format(part.filename))
+    if part.content_type is not None:
+        summary.append("Content-Type: {}".format(part.content_type))
+    summary.append("{} bytes{}".format(part.size, " (truncated)" if part.truncated else ""))
+    line = "; ".join(summary)
+    if part.preview is None:
+        return line + " (binary data)"
+    return line + "\r\n" + part.preview
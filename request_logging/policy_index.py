@@ -0,0 +1,112 @@
+from django.conf import settings
+
+try:
+    # Django >= 1.10
+    from django.urls import get_resolver
+except ImportError:
+    # Django < 1.10
+    from django.core.urlresolvers import get_resolver
+
+try:
+    from types import MappingProxyType
+except ImportError:
+    # Python 2 has no read-only mapping proxy
+    MappingProxyType = dict
+
+# Method key used for function based views, whose policy doesn't depend on the HTTP method
+ANY_METHOD = None
+
+
+def urlconf_name(urlconf):
+    """
+    Returns a hashable name for a urlconf, which may be a dotted module path, a module or None for ROOT_URLCONF.
+    """
+    if urlconf is None:
+        urlconf = getattr(settings, "ROOT_URLCONF", None)
+    return getattr(urlconf, "__name__", urlconf)
+
+
+def _pattern_str(entry):
+    if hasattr(entry, "pattern"):
+        # Django >= 2.0
+        return str(entry.pattern)
+    # Django < 2.0
+    return entry.regex.pattern
+
+
+def _join_route(route1, route2):
+    # Mirrors URLResolver._join_route, so the routes built here match ResolverMatch.route
+    if not route1:
+        return route2
+    if route2.startswith("^"):
+        route2 = route2[1:]
+    return route1 + route2
+
+
+def iter_view_routes(urlconf):
+    """
+    Walks the given urlconf, including nested includes, and yields (route, view) for every URL pattern
+    in resolution order.
+    """
+    return _iter_patterns("", get_resolver(urlconf).url_patterns)
+
+
+def _iter_patterns(prefix, patterns):
+    for entry in patterns:
+        route = _join_route(prefix, _pattern_str(entry))
+        if hasattr(entry, "url_patterns"):
+            for sub_route, view in _iter_patterns(route, entry.url_patterns):
+                yield sub_route, view
+        else:
+            yield route, entry.callback
+
+
+def view_methods(view):
+    """
+    Returns the lower-cased HTTP methods whose handler may carry its own logging policy, or (ANY_METHOD,)
+    for function based views.
+    """
+    # This is for "django rest framework"
+    if hasattr(view, "cls"):
+        if getattr(view, "actions", None):
+            return tuple(view.actions)
+        return tuple(view.cls.http_method_names)
+    # This is for django class-based views
+    if hasattr(view, "view_class"):
+        return tuple(view.view_class.http_method_names)
+    return (ANY_METHOD,)
+
+
+class PolicyIndex(object):
+    """
+    Immutable index from (urlconf, route, method) to a RoutePolicy, built once from the urlconfs at startup.
+    Request-time lookups use ResolverMatch.route, so they are a dict hit instead of a walk over view attributes.
+    """
+
+    def __init__(self, entries):
+        self._entries = MappingProxyType(dict(entries))
+        self.suppressed_count = sum(1 for policy in self._entries.values() if policy.no_logging)
+
+    def lookup(self, urlconf, route, method):
+        key = urlconf_name(urlconf)
+        policy = self._entries.get((key, route, method.lower()))
+        if policy is None:
+            policy = self._entries.get((key, route, ANY_METHOD))
+        return policy
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def build_policy_index(urlconfs, policy_for_view):
+    """
+    Builds a PolicyIndex for the given urlconfs. policy_for_view(view, method) is called once per
+    (route, method) and must return the RoutePolicy for that handler.
+    """
+    entries = {}
+    for urlconf in urlconfs:
+        name = urlconf_name(urlconf)
+        for route, view in iter_view_routes(urlconf):
+            for method in view_methods(view):
+                entries.setdefault((name, route, method), policy_for_view(view, method))
+    return PolicyIndex(entries)
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import namedtuple
+
+from .redaction import Redactor
+from .summarizers import decode_text
+
+DEFAULT_RECORDER_SIZE = 0
+DEFAULT_RECORDER_BODY_LENGTH = 1000
+
+# One recorded exchange. Bodies are kept as their first body_length bytes, as received, and are only decoded and
+# redacted when the recorder is dumped.
+RecordedExchange = namedtuple(
+    "RecordedExchange", ["time", "method", "path", "status", "duration", "request_body", "response_body"]
+)
+
+
+class FlightRecorder(object):
+    """
+    Keeps the last `size` exchanges served by this process in a ring buffer allocated once, so recording an
+    exchange only stores a tuple and a couple of short byte strings. A size of 0 disables recording.
+
+    The buffer lives in the memory of one process: with several workers, each one records its own requests.
+    """
+
+    def __init__(self, size=DEFAULT_RECORDER_SIZE, body_length=DEFAULT_RECORDER_BODY_LENGTH, redactor=None):
+        self._lock = threading.Lock()
+        self.configure(size, body_length, redactor)
+
+    def configure(self, size, body_length=DEFAULT_RECORDER_BODY_LENGTH, redactor=None):
+        """
+        Sets the size of the buffer, the number of bytes kept of each body and the Redactor applied when dumping.
+        Recorded exchanges are dropped when the size changes.
+        """
+        with self._lock:
+            if size != getattr(self, "size", None):
+                self.size = size
+                self._entries = [None] * size
+                self._next = 0
+            self.body_length = body_length
+            self.redactor = redactor or Redactor()
+
+    def record(self, method, path, status, duration, request_body=None, response_body=None):
+        entry = RecordedExchange(
+            time.time(), method, path, status, duration, self._truncate(request_body), self._truncate(response_body)
+        )
+        with self._lock:
+            if not self.size:
+                return
+            self._entries[self._next % self.size] = entry
+            self._next += 1
+
+    def _truncate(self, body):
+        if body is None:
+            return None
+        body = body[:self.body_length]
+        # Copied, so the recorder never keeps a whole body alive
+        return body.tobytes() if isinstance(body, memoryview) else body
+
+    def entries(self):
+        """
+        Returns the recorded exchanges, oldest first.
+        """
+        with self._lock:
+            start = max(0, self._next - self.size)
+            return [self._entries[i % self.size] for i in range(start, self._next)]
+
+    def dump(self):
+        """
+        Returns the recorded exchanges as dicts, oldest first, with their path and bodies redacted.
+        """
+        return [self._as_dict(entry) for entry in self.entries()]
+
+    def _as_dict(self, entry):
+        exchange = entry._asdict()
+        exchange["path"] = self.redactor.redact_query(entry.path)
+        for field in ("request_body", "response_body"):
+            body = exchange[field]
+            if body is not None:
+                exchange[field] = self.redactor.redact_text(decode_text(body, final=len(body) < self.body_length))
+        return exchange
+
+    def clear(self):
+        with self._lock:
+            self._entries = [None] * self.size
+            self._next = 0
+
+
+flight_recorder = FlightRecorder()
@@ -0,0 +1,82 @@
+import re
+
+REDACTED = "*****"
+
+
+def normalize_header_name(name):
+    # "HTTP_X_API_KEY", "X-Api-Key" and "x-api-key" are all the same header
+    name = name.lower()
+    if name.startswith("http_"):
+        name = name[5:]
+    return name.replace("_", "-")
+
+
+def _alternatives(names):
+    # Longest first, so a key never stops at a shorter key it starts with
+    return "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+
+
+class Redactor(object):
+    """
+    Replaces sensitive values with "*****" in logged headers, query strings and bodies.
+
+    All the rules are compiled once: header names into a set of normalized names, and query parameters, JSON
+    keys, form fields and patterns into one regex for query strings and one for bodies, so redacting a body is a
+    single pass over its (truncated) text. Names are matched case-insensitively, and so are the patterns.
+    """
+
+    def __init__(self, headers=(), query_params=(), body_keys=(), form_fields=(), patterns=()):
+        self.headers = frozenset(normalize_header_name(name) for name in headers)
+        self.form_fields = frozenset(name.lower() for name in form_fields)
+
+        pattern = "|".join("(?:{})".format(pattern) for pattern in patterns)
+        query_regex = []
+        if query_params:
+            query_regex.append(r"(?P<param>(?<![^?&])(?:{})=)[^&#]*".format(_alternatives(query_params)))
+        if pattern:
+            query_regex.append("(?P<pattern>{})".format(pattern))
+        self.query_regex = re.compile("|".join(query_regex), re.I) if query_regex else None
+
+        body_regex = []
+        if body_keys:
+            # "user.password" is matched as any "password" key, wherever it is nested
+            keys = set(key.rpartition(".")[2] for key in body_keys)
+            body_regex.append(r'(?P<key>"(?:{})"\s*:\s*)(?:"(?:[^"\\]|\\.)*"|[^\s,}}\]]+)'.format(_alternatives(keys)))
+        if form_fields:
+            body_regex.append(r"(?P<field>(?<![^&\s])(?:{})=)[^&\r\n]*".format(_alternatives(form_fields)))
+        if pattern:
+            body_regex.append("(?P<pattern>{})".format(pattern))
+        self.body_regex = re.compile("|".join(body_regex), re.I) if body_regex else None
+
+    def is_sensitive_header(self, name):
+        # Not memoized: header names come from clients, a cache keyed by them would grow without bound
+        return bool(self.headers) and normalize_header_name(name) in self.headers
+
+    def is_sensitive_field(self, name):
+        return name is not None and name.lower() in self.form_fields
+
+    def redact_headers(self, headers):
+        return {name: REDACTED if self.is_sensitive_header(name) else value for name, value in headers}
+
+    def redact_query(self, path):
+        """
+        Redacts the query string of a full path.
+        """
+        if self.query_regex is None or "?" not in path:
+            return path
+        path, _, query = path.partition("?")
+        return path + "?" + self.query_regex.sub(self._replace, query)
+
+    def redact_text(self, text):
+        if self.body_regex is None or not text:
+            return text
+        return self.body_regex.sub(self._replace, text)
+
+    def _replace(self, match):
+        groups = match.groupdict()
+        if groups.get("key") is not None:
+            return groups["key"] + '"' + REDACTED + '"'
+        for name in ("param", "field"):
+            if groups.get(name) is not None:
+                return groups[name] + REDACTED
+        return REDACTED
@@ -0,0 +1,76 @@
+import random
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Allows `rate` events per second on average, with bursts of up to `burst` events.
+    """
+
+    def __init__(self, rate, burst, clock=time.time):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self._clock = clock
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def consume(self):
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class Sampler(object):
+    """
+    Decides whether a request is logged: first by probability (the route's sample rate, or `sample_rate`), then by
+    a per-route token bucket allowing `rate_limit` logged requests per second with bursts of `rate_limit_burst`.
+    """
+
+    def __init__(self, sample_rate=1.0, rate_limit=None, rate_limit_burst=None, always_log_errors=True,
+                 random=random.random, clock=time.time):
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.rate_limit_burst = rate_limit_burst if rate_limit_burst is not None else rate_limit
+        self.always_log_errors = always_log_errors
+        self._random = random
+        self._clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def presample(self):
+        """
+        Draws the random number of a request before its route is known. Returns (roll, kept): kept tells whether
+        the request is kept at the global sample rate, roll is passed on to should_log() once the route is known
+        (None when the global rate keeps every request).
+        """
+        if self.sample_rate >= 1:
+            return None, True
+        roll = self._random()
+        return roll, roll < self.sample_rate
+
+    def should_log(self, route_key, route_sample_rate=None, roll=None):
+        sample_rate = self.sample_rate if route_sample_rate is None else route_sample_rate
+        if sample_rate < 1:
+            if roll is None:
+                roll = self._random()
+            if roll >= sample_rate:
+                return False
+        if self.rate_limit is None:
+            return True
+        return self._get_bucket(route_key).consume()
+
+    def _get_bucket(self, route_key):
+        bucket = self._buckets.get(route_key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(
+                    route_key, TokenBucket(self.rate_limit, self.rate_limit_burst, clock=self._clock)
+                )
+        return bucket
@@ -0,0 +1,172 @@
+import codecs
+import json
+
+try:
+    from urllib.parse import parse_qsl
+except ImportError:
+    # Python 2
+    from urlparse import parse_qsl
+
+# Number of distinct Content-Type values whose lookup is memoized
+LOOKUP_CACHE_SIZE = 256
+
+
+def decode_text(body, final=True, errors="replace"):
+    """
+    Decodes a (possibly truncated) body as utf-8 text. Unless final is set, a multibyte character cut at the end
+    is dropped instead of being treated as an error. Anything that isn't bytes-like is returned as is.
+    """
+    if not isinstance(body, (bytes, bytearray, memoryview)):
+        return body
+    if isinstance(body, memoryview) and str is bytes:
+        # Python 2 decoders don't accept memoryviews
+        body = body.tobytes()
+    return codecs.getincrementaldecoder("utf-8")(errors).decode(body, final=final)
+
+
+def media_type_of(content_type):
+    # "Application/JSON; charset=utf-8" -> "application/json"
+    return content_type.partition(";")[0].strip().lower()
+
+
+class TextSummarizer(object):
+    """
+    Logs the body as text.
+    """
+
+    def __call__(self, body, media_type, size):
+        return decode_text(body, final=len(body) >= size)
+
+
+class JSONSummarizer(TextSummarizer):
+    """
+    Logs JSON bodies as text, optionally keeping only the given top-level `keys` and replacing containers nested
+    deeper than `max_depth` with "{...}" / "[...]". Bodies cut by the max body length can't be parsed and are
+    logged as text.
+    """
+
+    def __init__(self, keys=None, max_depth=None):
+        self.keys = keys
+        self.max_depth = max_depth
+
+    def __call__(self, body, media_type, size):
+        text = super(JSONSummarizer, self).__call__(body, media_type, size)
+        if (self.keys is None and self.max_depth is None) or len(body) < size:
+            return text
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return text
+        if self.keys is not None and isinstance(data, dict):
+            data = {key: data[key] for key in self.keys if key in data}
+        if self.max_depth is not None:
+            data = self._limit_depth(data, self.max_depth)
+        return json.dumps(data)
+
+    def _limit_depth(self, data, depth):
+        if isinstance(data, dict):
+            if depth <= 0:
+                return "{...}"
+            return {key: self._limit_depth(value, depth - 1) for key, value in data.items()}
+        if isinstance(data, list):
+            if depth <= 0:
+                return "[...]"
+            return [self._limit_depth(value, depth - 1) for value in data]
+        return data
+
+
+class FormSummarizer(TextSummarizer):
+    """
+    Logs application/x-www-form-urlencoded bodies with their keys and values unquoted.
+    """
+
+    def __call__(self, body, media_type, size):
+        text = super(FormSummarizer, self).__call__(body, media_type, size)
+        return "&".join("{}={}".format(key, value) for key, value in parse_qsl(text, keep_blank_values=True))
+
+
+class SizeSummarizer(object):
+    """
+    Logs only the media type and size of the body, for binary formats that are not readable as text.
+    """
+
+    def __call__(self, body, media_type, size):
+        return "({}: {} bytes)".format(media_type, size)
+
+
+class SummarizerRegistry(object):
+    """
+    Maps media types to summarizers, callables taking (body, media_type, size) and returning the text to log,
+    where body is the body truncated to the max body length and size is the length of the whole body.
+
+    Summarizers are registered for an exact media type ("application/json"), a structured syntax suffix ("+json")
+    or a whole top-level type ("image/*"), looked up in that order.
+    """
+
+    def __init__(self, summarizers=None):
+        self._summarizers = {}
+        self._lookups = {}
+        for media_type, summarizer in (summarizers or {}).items():
+            self.register(media_type, summarizer)
+
+    def register(self, media_type, summarizer):
+        """
+        Registers a summarizer for a media type, or unregisters it when summarizer is None.
+        """
+        if summarizer is None:
+            self._summarizers.pop(media_type.lower(), None)
+        else:
+            self._summarizers[media_type.lower()] = summarizer
+        self._lookups = {}
+
+    def get(self, content_type):
+        """
+        Returns (media_type, summarizer) for a Content-Type header value, summarizer being None when no summarizer
+        is registered for it.
+        """
+        lookup = self._lookups.get(content_type)
+        if lookup is None:
+            lookup = self._lookup(content_type)
+            lookups = self._lookups
+            if len(lookups) >= LOOKUP_CACHE_SIZE:
+                lookups = {}
+            lookups[content_type] = lookup
+            # Replaced rather than cleared so concurrent readers never see a partially cleared dict
+            self._lookups = lookups
+        return lookup
+
+    def _lookup(self, content_type):
+        media_type = media_type_of(content_type)
+        summarizer = self._summarizers.get(media_type)
+        if summarizer is None and "+" in media_type:
+            summarizer = self._summarizers.get("+" + media_type.rpartition("+")[2])
+        if summarizer is None:
+            summarizer = self._summarizers.get(media_type.partition("/")[0] + "/*")
+        return media_type, summarizer
+
+    def summarize(self, content_type, body, size):
+        """
+        Returns the summary of a body, or None when no summarizer is registered for its content type.
+        """
+        media_type, summarizer = self.get(content_type)
+        if summarizer is None:
+            return None
+        return summarizer(body, media_type, size)
+
+
+DEFAULT_SUMMARIZERS = {
+    "application/json": JSONSummarizer(),
+    "+json": JSONSummarizer(),
+    "application/x-www-form-urlencoded": FormSummarizer(),
+    "application/xml": TextSummarizer(),
+    "text/xml": TextSummarizer(),
+    "+xml": TextSummarizer(),
+    "application/protobuf": SizeSummarizer(),
+    "application/x-protobuf": SizeSummarizer(),
+    "application/vnd.google.protobuf": SizeSummarizer(),
+    "application/msgpack": SizeSummarizer(),
+    "application/x-msgpack": SizeSummarizer(),
+    "application/vnd.msgpack": SizeSummarizer(),
+    "image/*": SizeSummarizer(),
+    "text/*": TextSummarizer(),
+}
@@ -0,0 +1,25 @@
+import json
+
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+
+from .decorators import no_logging
+from .recorder import flight_recorder
+
+JSON_LINES_CONTENT_TYPE = "application/x-ndjson"
+
+
+def dump_json_lines(exchanges):
+    return "".join(json.dumps(exchange, sort_keys=True) + "\n" for exchange in exchanges)
+
+
+@no_logging(value=True, silent=True)
+def recent_requests(request):
+    """
+    Returns the exchanges kept by the flight recorder of the process serving this request as JSON lines, oldest
+    first. Only active staff users are allowed.
+    """
+    user = getattr(request, "user", None)
+    if user is None or not (user.is_active and user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(dump_json_lines(flight_recorder.dump()), content_type=JSON_LINES_CONTENT_TYPE)
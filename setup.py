@@ -48,7 +48,7 @@ setup(
     author="Rhumbix",
     author_email="dev@rhumbix.com",
     license="MIT",
-    packages=["request_logging"],
+    packages=["request_logging", "request_logging.management", "request_logging.management.commands"],
     install_requires=["Django"],
     zip_safe=False,
 )
@@ -43,6 +43,16 @@ def dont_log_empty_response_body(request):
     return HttpResponse(status=201)
 
 
+@no_logging("Streamed upload", log_body=False)
+def dont_log_body(request):
+    return HttpResponse(status=200, body="view_func with no body logging")
+
+
+@no_logging(value=False, sample_rate=0)
+def never_sampled(request):
+    return HttpResponse(status=200, body="view_func that is never sampled")
+
+
 class UnannotatedDRF(viewsets.ModelViewSet):
     @no_logging("DRF explicit annotation")
     def list(self, request):
@@ -68,4 +78,6 @@ urlpatterns = [
     url(r"^test_msg$", view_msg),
     url(r"^dont_log_empty_response_body$", dont_log_empty_response_body),
     url(r"^dont_log_silent$", dont_log_silent),
+    url(r"^dont_log_body$", dont_log_body),
+    url(r"^never_sampled$", never_sampled),
 ] + router.urls
@@ -1,15 +1,36 @@
 #! /usr/bin/env python
 import io
+import json
 import logging
+import os
+import shutil
+import tempfile
 import mock
-import re
+import threading
+import time
 import unittest
 
+import django
 from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.management import CommandError, call_command
 from django.test import RequestFactory, override_settings
-from django.http import HttpResponse, StreamingHttpResponse
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 
 import request_logging
+from request_logging.formatters import JSONLinesFormatter
+from request_logging.handlers import BatchingHandler, JSONLinesFileHandler
+from request_logging.headers import HeaderFilter
+from request_logging.levels import LogLevelTable
+from request_logging.metrics import latency_histogram
+from request_logging.management.commands.dump_recent_requests import Command as DumpRecentRequestsCommand
+from request_logging.multipart import format_part, iter_parts, parse_boundary
+from request_logging.recorder import FlightRecorder, flight_recorder
+from request_logging.redaction import Redactor
+from request_logging.sampling import Sampler
+from request_logging.summarizers import JSONSummarizer, SizeSummarizer, SummarizerRegistry
+from request_logging.views import recent_requests
+from request_logging.emitters import QueueLogger, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST
 from request_logging.middleware import (
     LoggingMiddleware,
     DEFAULT_LOG_LEVEL,
@@ -18,6 +39,9 @@ from request_logging.middleware import (
     NO_LOGGING_MSG,
     DEFAULT_HTTP_4XX_LOG_LEVEL,
     IS_DJANGO_VERSION_GTE_3_2_0,
+    REQUEST_POLICY_ATTR,
+    REQUEST_TIMINGS_ATTR,
+    STRUCTURED_RECORD_ATTR,
 )
 
 settings.configure()
@@ -122,7 +146,7 @@ class LogTestCase(BaseLogTestCase):
         datafile = io.BytesIO(body)
         request = self.factory.post("/somewhere", data={"file": datafile})
         self.middleware.__call__(request)
-        self._assert_logged(mock_log, "(multipart/form)")
+        self._assert_logged(mock_log, "(binary data)")
 
     def test_request_headers_logged(self, mock_log):
         request = self.factory.post("/somewhere", **{"HTTP_USER_AGENT": "silly-human"})
@@ -209,6 +233,13 @@ class LogTestCase(BaseLogTestCase):
         else:
             self._assert_logged(mock_log, "HTTP_USER_AGENT")
 
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_empty_body_not_logged(self, mock_log):
+        LoggingMiddleware(self.middleware.get_response)(self.factory.get("/somewhere"))
+        self.assertTrue(mock_log.log.called)
+        for call in mock_log.log.call_args_list:
+            self.assertNotEqual("", call[0][1])
+
     def test_call_binary_logged(self, mock_log):
         body = u"some body"
         datafile = io.StringIO(body)
@@ -231,7 +262,7 @@ class LogTestCase(BaseLogTestCase):
         datafile = io.BytesIO(body)
         request = self.factory.post("/somewhere", data={"file": datafile}, **{"HTTP_USER_AGENT": "silly-human"})
         self.middleware.__call__(request)
-        self._assert_logged(mock_log, "(multipart/form)")
+        self._assert_logged(mock_log, "(binary data)")
         self._assert_logged(mock_log, "test_headers")
         if IS_DJANGO_VERSION_GTE_3_2_0:
             self._assert_logged(mock_log, "User-Agent")
@@ -297,6 +328,1240 @@ class BaseLogSettingsTestCase(BaseLogTestCase):
         )
 
 
+@mock.patch.object(request_logging.middleware, "request_logger")
+class AsyncMiddlewareTestCase(BaseLogTestCase):
+    def setUp(self):
+        from asgiref.sync import sync_to_async
+
+        self.factory = RequestFactory()
+        self.async_get_response = sync_to_async(
+            lambda request: HttpResponse('{"example":"response"}', content_type="application/json")
+        )
+
+    def test_sync_get_response_stays_sync(self, mock_log):
+        import asyncio
+
+        middleware = LoggingMiddleware(lambda request: HttpResponse(status=200))
+        self.assertFalse(middleware.is_async)
+        self.assertFalse(asyncio.iscoroutinefunction(middleware))
+
+    def test_async_get_response_is_awaited_natively(self, mock_log):
+        import asyncio
+        from asgiref.sync import async_to_sync
+
+        middleware = LoggingMiddleware(self.async_get_response)
+        self.assertTrue(middleware.is_async)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        request = self.factory.post("/somewhere", data={"file": u"some body"})
+        # set_urlconf() is thread local and the coroutine runs on another thread
+        request.urlconf = "test_urls"
+        response = async_to_sync(middleware)(request)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(middleware.logger.flush(5))
+        self._assert_logged(mock_log, "some body")
+        self._assert_logged(mock_log, "POST /somewhere - 200")
+
+    @override_settings(REQUEST_LOGGING_LOG_STREAMING_RESPONSES=True, REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_streaming_tee_installed_before_return(self, mock_log):
+        from asgiref.sync import async_to_sync, sync_to_async
+
+        chunks = [b'{"chunk": 1}', b'{"chunk": 2}']
+        middleware = LoggingMiddleware(sync_to_async(
+            lambda request: StreamingHttpResponse(streaming_content=iter(chunks), content_type="application/json")
+        ))
+        request = self.factory.get("/somewhere")
+        request.urlconf = "test_urls"
+        response = async_to_sync(middleware)(request)
+        # The server starts sending the content as soon as the response is returned
+        self.assertEqual(b"".join(chunks), b"".join(response.streaming_content))
+        self.assertTrue(middleware.logger.flush(5))
+        self._assert_logged(mock_log, '{"chunk": 1}{"chunk": 2}')
+        self._assert_logged(mock_log, "(data_stream: 24 bytes in ")
+
+    @unittest.skipIf(django.VERSION < (4, 2), "async iterators in StreamingHttpResponse need Django >= 4.2")
+    @override_settings(REQUEST_LOGGING_LOG_STREAMING_RESPONSES=True, REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_async_streaming_response(self, mock_log):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        from django.urls import re_path
+        from request_logging.emitters import _flush_queue_loggers
+
+        async def chunks():
+            for i in range(3):
+                yield b'{"chunk": %d}' % i
+
+        class AsyncStreamUrls(object):
+            urlpatterns = [
+                re_path(
+                    r"^stream$",
+                    lambda request: StreamingHttpResponse(streaming_content=chunks(), content_type="application/json"),
+                )
+            ]
+
+        async def fetch():
+            response = await AsyncClient().get("/stream")
+            return response, b"".join([chunk async for chunk in response.streaming_content])
+
+        middleware = ["request_logging.middleware.LoggingMiddleware"]
+        with override_settings(ROOT_URLCONF=AsyncStreamUrls, MIDDLEWARE=middleware):
+            response, content = async_to_sync(fetch)()
+        self.assertTrue(response.is_async)
+        self.assertEqual(b'{"chunk": 0}{"chunk": 1}{"chunk": 2}', content)
+        _flush_queue_loggers(5)
+        self._assert_logged(mock_log, '{"chunk": 0}{"chunk": 1}{"chunk": 2}')
+        self._assert_logged(mock_log, "(data_stream: 36 bytes in ")
+
+    def test_async_records_are_queued(self, mock_log):
+        middleware = LoggingMiddleware(self.async_get_response)
+        self.assertIsInstance(middleware.logger, QueueLogger)
+        with override_settings(REQUEST_LOGGING_QUEUE_SIZE=1):
+            middleware = LoggingMiddleware(self.async_get_response)
+        self.assertEqual(1, middleware.logger._queue.maxsize)
+
+    @override_settings(REQUEST_LOGGING_EMITTER="queue", REQUEST_LOGGING_QUEUE_OVERFLOW="block")
+    def test_async_queue_never_blocks(self, mock_log):
+        self.assertEqual("block", LoggingMiddleware(lambda request: HttpResponse()).logger.overflow)
+        self.assertEqual(OVERFLOW_DROP_NEWEST, LoggingMiddleware(self.async_get_response).logger.overflow)
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class QueueEmitterTestCase(BaseLogTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.release = threading.Event()
+        self.emitted = []
+
+        release, emitted = self.release, self.emitted
+
+        class BlockedLogger(object):
+            def is_enabled_for(self, level):
+                return True
+
+            def log(self, level, msg, logging_context):
+                release.wait(5)
+                emitted.append(msg)
+
+            log_error = log
+
+        self.blocked_logger = BlockedLogger()
+
+    def tearDown(self):
+        self.release.set()
+
+    @override_settings(REQUEST_LOGGING_EMITTER="queue")
+    def test_queue_emitter_logs_in_background(self, mock_log):
+        middleware = LoggingMiddleware(lambda request: HttpResponse(status=200))
+        self.assertIsInstance(middleware.logger, QueueLogger)
+        request = self.factory.post("/somewhere", data={"file": u"some body"})
+        request.urlconf = "test_urls"
+        middleware.__call__(request)
+        self.assertTrue(middleware.logger.flush(5))
+        self._assert_logged(mock_log, "some body")
+        self._assert_logged(mock_log, "POST /somewhere - 200")
+
+    def test_drop_newest(self, mock_log):
+        logger = QueueLogger(self.blocked_logger, 1, OVERFLOW_DROP_NEWEST)
+        for msg in ("first", "second", "third", "fourth"):
+            logger.log(logging.INFO, msg, {})
+        self.release.set()
+        self.assertTrue(logger.flush(5))
+        self.assertNotIn("fourth", self.emitted)
+        self.assertGreaterEqual(logger.dropped, 1)
+        self.assertEqual(4, len(self.emitted) + logger.dropped)
+
+    def test_drop_oldest(self, mock_log):
+        logger = QueueLogger(self.blocked_logger, 1, OVERFLOW_DROP_OLDEST)
+        for msg in ("first", "second", "third", "fourth"):
+            logger.log(logging.INFO, msg, {})
+        self.release.set()
+        self.assertTrue(logger.flush(5))
+        self.assertIn("fourth", self.emitted)
+        self.assertGreaterEqual(logger.dropped, 1)
+        self.assertEqual(4, len(self.emitted) + logger.dropped)
+
+    def test_request_time_passed_to_records(self, mock_log):
+        contexts = []
+
+        class RecordingLogger(object):
+            def is_enabled_for(self, level):
+                return True
+
+            def log(self, level, msg, logging_context):
+                contexts.append(logging_context)
+
+        before = time.time()
+        logger = QueueLogger(RecordingLogger(), 10)
+        logger.log(logging.INFO, "msg", {"args": (), "kwargs": {"extra": {"request": None}}})
+        self.assertTrue(logger.flush(5))
+        extra = contexts[0]["kwargs"]["extra"]
+        self.assertIsNone(extra["request"])
+        self.assertGreaterEqual(extra["request_time"], before)
+        self.assertLessEqual(extra["request_time"], time.time())
+
+    @override_settings(REQUEST_LOGGING_EMITTER="queue")
+    def test_response_headers_snapshot(self, mock_log):
+        middleware = LoggingMiddleware(lambda request: HttpResponse(status=200))
+        middleware.logger = QueueLogger(self.blocked_logger, 10)
+        request = self.factory.get("/somewhere")
+        request.urlconf = "test_urls"
+        response = middleware.__call__(request)
+        response["X-Later"] = "changed after the middleware"
+        self.release.set()
+        self.assertTrue(middleware.logger.flush(5))
+        self.assertFalse([msg for msg in self.emitted if "X-Later" in str(msg)])
+
+    @override_settings(REQUEST_LOGGING_EMITTER="queue")
+    def test_queued_records_hold_plain_data(self, mock_log):
+        contexts = []
+
+        class RecordingLogger(object):
+            def is_enabled_for(self, level):
+                return True
+
+            def log(self, level, msg, logging_context):
+                contexts.append(logging_context)
+
+            log_error = log_record = log
+
+        middleware = LoggingMiddleware(lambda request: HttpResponse(status=201))
+        middleware.logger = QueueLogger(RecordingLogger(), 10)
+        request = self.factory.post("/somewhere?q=1", data={"file": u"some body"})
+        request.urlconf = "test_urls"
+        middleware.__call__(request)
+        self.assertTrue(middleware.logger.flush(5))
+        self.assertTrue(contexts)
+        for context in contexts:
+            extra = context["kwargs"]["extra"]
+            self.assertIsNone(extra["request"])
+            self.assertIsNone(extra["response"])
+            self.assertEqual(("POST", "/somewhere"), (extra["method"], extra["path"]))
+        self.assertEqual(201, contexts[-1]["kwargs"]["extra"]["status_code"])
+
+    def test_exit_hook_registered_once(self, mock_log):
+        with mock.patch("atexit.register") as register:
+            QueueLogger(self.blocked_logger, 1)
+            QueueLogger(self.blocked_logger, 1)
+        self.assertFalse(register.called)
+
+    @override_settings(REQUEST_LOGGING_EMITTER="carrier pigeon")
+    def test_invalid_emitter(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+    @override_settings(REQUEST_LOGGING_EMITTER="queue", REQUEST_LOGGING_QUEUE_OVERFLOW="drop-everything")
+    def test_invalid_overflow_policy(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class StructuredLoggingTestCase(BaseLogTestCase):
+    def setUp(self):
+        from django.urls import set_urlconf
+
+        set_urlconf("test_urls")
+        self.factory = RequestFactory()
+
+        def get_response(request):
+            return HttpResponse('{"example":\n"response"}', content_type="application/json", status=201)
+
+        self.get_response = get_response
+
+    def _fields(self, mock_log):
+        self.assertEqual(1, mock_log.log.call_count)
+        return mock_log.log.call_args[1]["extra"][STRUCTURED_RECORD_ATTR]
+
+    @override_settings(REQUEST_LOGGING_STRUCTURED=True, REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_one_record_per_exchange(self, mock_log):
+        body = "line one\nline two"
+        request = self.factory.post("/somewhere", data=body, content_type="text/plain", HTTP_USER_AGENT="silly-human")
+        LoggingMiddleware(self.get_response).__call__(request)
+
+        fields = self._fields(mock_log)
+        self.assertEqual("POST /somewhere - 201", mock_log.log.call_args[0][1])
+        self.assertEqual(logging.INFO, mock_log.log.call_args[0][0])
+        self.assertEqual("POST", fields["method"])
+        self.assertEqual(201, fields["status"])
+        self.assertEqual(body.encode(), fields["request_body"])
+        self.assertIn("silly-human", fields["request_headers"].values())
+        self.assertEqual(b'{"example":\n"response"}', fields["response_body"])
+        self.assertGreaterEqual(fields["duration"], 0)
+        self.assertIs(request, mock_log.log.call_args[1]["extra"]["request"])
+
+    @override_settings(REQUEST_LOGGING_STRUCTURED=True)
+    def test_body_not_logged(self, mock_log):
+        request = self.factory.post("/dont_log_body", data="some body", content_type="text/plain")
+        LoggingMiddleware(self.get_response).__call__(request)
+        self.assertIsNone(self._fields(mock_log)["request_body"])
+
+    @override_settings(REQUEST_LOGGING_STRUCTURED="Not a boolean")
+    def test_invalid_structured(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class TailCaptureTestCase(BaseLogTestCase):
+    def setUp(self):
+        from django.urls import set_urlconf
+
+        set_urlconf("test_urls")
+        self.factory = RequestFactory()
+        self.status = 200
+
+        def get_response(request):
+            return HttpResponse('{"example": "response"}', content_type="application/json", status=self.status)
+
+        self.get_response = get_response
+
+    def _call(self):
+        request = self.factory.post("/somewhere", data="some body", content_type="text/plain", HTTP_USER_AGENT="ua")
+        LoggingMiddleware(self.get_response).__call__(request)
+
+    @override_settings(REQUEST_LOGGING_TAIL_CAPTURE=True, REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_success_logs_summary_only(self, mock_log):
+        self._call()
+        self.assertEqual(
+            [mock.call(logging.INFO, "POST /somewhere - 200", extra=mock.ANY)], mock_log.log.call_args_list
+        )
+
+    @override_settings(REQUEST_LOGGING_TAIL_CAPTURE=True, REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_failure_logs_details(self, mock_log):
+        for status in (404, 500):
+            self.status = status
+            self._call()
+            self._assert_logged(mock_log, "POST /somewhere - {}".format(status))
+            self._assert_logged(mock_log, "some body")
+            self._assert_logged(mock_log, "ua")
+            self._assert_logged(mock_log, '"response"')
+
+    @override_settings(REQUEST_LOGGING_TAIL_CAPTURE=True, REQUEST_LOGGING_STRUCTURED=True)
+    def test_structured_summary(self, mock_log):
+        self._call()
+        fields = mock_log.log.call_args[1]["extra"][STRUCTURED_RECORD_ATTR]
+        self.assertEqual({"method", "path", "status", "duration", "timings"}, set(fields))
+        self.status = 500
+        self._call()
+        fields = mock_log.log.call_args[1]["extra"][STRUCTURED_RECORD_ATTR]
+        self.assertEqual(b"some body", fields["request_body"])
+
+    @override_settings(REQUEST_LOGGING_TAIL_CAPTURE="yes")
+    def test_invalid_setting(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class ExceptionLoggingTestCase(BaseLogTestCase):
+    def setUp(self):
+        from django.urls import set_urlconf
+
+        set_urlconf("test_urls")
+        self.factory = RequestFactory()
+        self.exception = ValueError("boom")
+
+    def _request(self):
+        return self.factory.post("/somewhere", data="some body", content_type="text/plain")
+
+    def _middleware(self):
+        def get_response(request):
+            # What Django's handler does with an exception raised by the view
+            try:
+                raise self.exception
+            except Exception as e:
+                middleware.process_exception(request, e)
+            return HttpResponse("Server Error", status=500)
+
+        middleware = LoggingMiddleware(get_response)
+        return middleware
+
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_exception_logged_once_with_request(self, mock_log):
+        self._middleware()(self._request())
+        messages = [call[0][1] for call in mock_log.log.call_args_list]
+        self.assertEqual(2, len(messages))
+        self.assertRegex(messages[0], r"^POST /somewhere - ValueError \(\d+\.\d{3}s\)\nsome body$")
+        self.assertEqual(logging.ERROR, mock_log.log.call_args_list[0][0][0])
+        # Django logs the traceback itself
+        self.assertNotIn("exc_info", mock_log.log.call_args_list[0][1])
+        self.assertEqual("POST /somewhere - 500", messages[1])
+
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE=False, DEBUG_PROPAGATE_EXCEPTIONS=True)
+    def test_propagated_exception(self, mock_log):
+        def get_response(request):
+            raise self.exception
+
+        request = self.factory.post("/somewhere", data="some body\n", content_type="text/plain")
+        with mock.patch.object(request_logging.middleware, "perf_counter", return_value=1.0):
+            with self.assertRaises(ValueError):
+                LoggingMiddleware(get_response)(request)
+        self.assertEqual(1, mock_log.log.call_count)
+        self.assertEqual("POST /somewhere - ValueError (0.000s)\nsome body", mock_log.log.call_args[0][1])
+        self.assertIs(self.exception, mock_log.log.call_args[1]["exc_info"][1])
+
+    def test_client_errors_ignored(self, mock_log):
+        middleware = LoggingMiddleware()
+        middleware.process_exception(self._request(), Http404())
+        self.assertFalse(mock_log.log.called)
+
+    @override_settings(REQUEST_LOGGING_STRUCTURED=True)
+    def test_structured(self, mock_log):
+        self._middleware()(self._request())
+        fields = mock_log.log.call_args_list[0][1]["extra"][STRUCTURED_RECORD_ATTR]
+        self.assertEqual("ValueError", fields["exception"])
+        self.assertEqual(b"some body", fields["request_body"])
+        self.assertGreaterEqual(fields["duration"], 0)
+
+
+class MultipartParserTestCase(unittest.TestCase):
+    body = (
+        b"--b0undary\r\n"
+        b'Content-Disposition: form-data; name="comment"\r\n'
+        b"Content-Type: text/plain; charset=latin-1\r\n\r\n"
+        b"caf\xe9\r\n"
+        b"--b0undary\r\n"
+        b'Content-Disposition: form-data; name="upload"; filename="a;b.png"\r\n'
+        b"Content-Type: image/png\r\n\r\n"
+        b"\x89PNG\r\n\x1a\n\x00\x00\r\n"
+        b"--b0undary--\r\n"
+    )
+
+    def test_parse_boundary(self):
+        self.assertEqual(b"b0undary", parse_boundary("multipart/form-data; boundary=b0undary"))
+        self.assertEqual(b"a b;c", parse_boundary('Multipart/Form-Data; charset=utf-8; BOUNDARY="a b;c"'))
+        self.assertIsNone(parse_boundary("application/json"))
+        self.assertIsNone(parse_boundary("multipart/form-data"))
+
+    def test_parts_summarized(self):
+        text, binary = list(iter_parts(self.body, b"b0undary"))
+        self.assertEqual(("comment", None, "text/plain; charset=latin-1", 4, False), text[:5])
+        self.assertEqual(u"caf\xe9", text.preview)
+        self.assertEqual(("upload", "a;b.png", "image/png", 10, False, None), binary)
+        self.assertEqual('name="upload"; filename="a;b.png"; Content-Type: image/png; 10 bytes (binary data)',
+                         format_part(binary))
+
+    def test_truncated_body(self):
+        end = self.body.index(b"\x1a")
+        text, binary = list(iter_parts(self.body, b"b0undary", end))
+        self.assertFalse(text.truncated)
+        self.assertTrue(binary.truncated)
+        self.assertEqual(6, binary.size)
+
+    def test_boundary_in_content_is_not_a_delimiter(self):
+        body = b'--xx\r\nContent-Disposition: form-data; name="a"\r\n\r\n--xx is not here\r\n--xx--\r\n'
+        parts = list(iter_parts(body, b"xx"))
+        self.assertEqual(1, len(parts))
+        self.assertEqual("--xx is not here", parts[0].preview)
+
+
+class JSONLinesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _record(self, msg="\x1b[36mPOST /somewhere - 200\x1b[0m", **fields):
+        record = logging.LogRecord("django.request", logging.INFO, __file__, 1, msg, (), None)
+        setattr(record, STRUCTURED_RECORD_ATTR, fields)
+        return record
+
+    def test_structured_record_schema(self):
+        record = self._record(
+            method="POST",
+            path="/somewhere",
+            status=200,
+            request_headers={"User-Agent": "silly-human"},
+            request_body=b"\xff\xd8binary",
+            response_body=b'{"example":"response"}',
+        )
+        entry = json.loads(JSONLinesFormatter().format(record))
+        self.assertEqual("POST /somewhere - 200", entry["message"])
+        self.assertEqual("INFO", entry["level"])
+        self.assertEqual(200, entry["status"])
+        self.assertEqual({"User-Agent": "silly-human"}, entry["request"]["headers"])
+        self.assertEqual("base64", entry["request"]["body_encoding"])
+        self.assertEqual("/9hiaW5hcnk=", entry["request"]["body"])
+        self.assertEqual("utf-8", entry["response"]["body_encoding"])
+        self.assertEqual('{"example":"response"}', entry["response"]["body"])
+
+    def test_plain_record(self):
+        record = logging.LogRecord("django.request", logging.DEBUG, __file__, 1, "multi\nline", (), None)
+        entry = json.loads(JSONLinesFormatter().format(record))
+        self.assertEqual("multi\nline", entry["message"])
+        self.assertIsNone(entry["status"])
+
+    def test_request_time(self):
+        record = self._record()
+        record.request_time = 1.25
+        entry = json.loads(JSONLinesFormatter().format(record))
+        self.assertEqual("1970-01-01T00:00:01.250Z", entry["time"])
+
+    def test_file_handler_writes_and_rotates(self):
+        filename = os.path.join(self.tmpdir, "requests.jsonl")
+        handler = JSONLinesFileHandler(filename, maxBytes=1000, backupCount=2)
+        for i in range(20):
+            handler.handle(self._record(method="GET", path="/{}".format(i), status=200))
+        handler.close()
+
+        self.assertTrue(os.path.exists(filename + ".1"))
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        self.assertEqual("/19", json.loads(lines[-1])["path"])
+        self.assertLessEqual(os.path.getsize(filename + ".1"), 1000)
+
+
+class BatchingHandlerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.stream = mock.MagicMock()
+        self.target = logging.StreamHandler(self.stream)
+
+    def _record(self, msg):
+        return logging.LogRecord("django.request", logging.INFO, __file__, 1, msg, (), None)
+
+    def test_flushes_batch_in_one_write(self):
+        handler = BatchingHandler(capacity=3, target=self.target, flush_interval=0)
+        handler.handle(self._record("one"))
+        handler.handle(self._record("two"))
+        self.assertFalse(self.stream.write.called)
+        handler.handle(self._record("three"))
+        self.stream.write.assert_called_once_with("one\ntwo\nthree\n")
+        self.assertEqual(1, self.stream.flush.call_count)
+
+    def test_flushes_on_buffered_bytes(self):
+        handler = BatchingHandler(capacity=100, target=self.target, flush_interval=0, max_buffer_bytes=10)
+        handler.handle(self._record(20 * "x"))
+        self.stream.write.assert_called_once_with(20 * "x" + "\n")
+
+    def test_flushes_on_interval(self):
+        handler = BatchingHandler(capacity=100, target=self.target, flush_interval=0.01)
+        handler.handle(self._record("one"))
+        for _ in range(500):
+            if self.stream.write.called:
+                break
+            threading.Event().wait(0.01)
+        handler.close()
+        self.stream.write.assert_called_once_with("one\n")
+
+    def test_flushes_on_close(self):
+        handler = BatchingHandler(capacity=100, target=self.target, flush_interval=0)
+        handler.handle(self._record("one"))
+        handler.close()
+        self.stream.write.assert_called_once_with("one\n")
+
+    def test_hard_cap_without_target(self):
+        handler = BatchingHandler(capacity=100, flush_interval=0, max_buffer_bytes=10)
+        for msg in ("aaaa", "bbbb", "cccc", "dddd"):
+            handler.handle(self._record(msg))
+        self.assertLessEqual(handler.buffered_bytes, 10)
+        self.assertEqual(["cccc", "dddd"], [record.getMessage() for record in handler.buffer])
+        self.assertEqual(2, handler.dropped)
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class SamplingTestCase(BaseLogTestCase):
+    def setUp(self):
+        from django.urls import set_urlconf
+
+        set_urlconf("test_urls")
+        self.factory = RequestFactory()
+        self.status = 200
+
+        def get_response(request):
+            return HttpResponse(status=self.status)
+
+        self.get_response = get_response
+
+    def _call(self, middleware, uri="/somewhere"):
+        request = self.factory.post(uri, data="some body", content_type="text/plain")
+        middleware.__call__(request)
+        return request
+
+    @override_settings(REQUEST_LOGGING_SAMPLE_RATE=0)
+    def test_sampled_out_request_is_not_read_nor_logged(self, mock_log):
+        request = self._call(LoggingMiddleware(self.get_response))
+        self.assertFalse(mock_log.log.called)
+        self.assertFalse(request._read_started)
+
+    @override_settings(REQUEST_LOGGING_SAMPLE_RATE=0)
+    def test_sampled_out_errors_are_logged(self, mock_log):
+        self.status = 500
+        self._call(LoggingMiddleware(self.get_response))
+        self._assert_logged(mock_log, "POST /somewhere - 500")
+        self._assert_not_logged(mock_log, "some body")
+
+    @override_settings(REQUEST_LOGGING_SAMPLE_RATE=0, REQUEST_LOGGING_SAMPLE_ALWAYS_LOG_ERRORS=False)
+    def test_sampled_out_errors_can_be_dropped(self, mock_log):
+        self.status = 500
+        self._call(LoggingMiddleware(self.get_response))
+        self.assertFalse(mock_log.log.called)
+
+    @override_settings(REQUEST_LOGGING_SAMPLE_RATE=0.5)
+    def test_sampled_out_before_the_body_is_captured(self, mock_log):
+        middleware = LoggingMiddleware(self.get_response)
+        middleware.sampler._random = lambda: 0.7
+        with mock.patch.object(request_logging.middleware, "RequestBodyTee") as tee:
+            request = self._call(middleware)
+        self.assertFalse(tee.called)
+        self.assertFalse(mock_log.log.called)
+        self.assertFalse(request._read_started)
+
+        middleware.sampler._random = lambda: 0.2
+        self._call(middleware)
+        self._assert_logged(mock_log, "some body")
+
+    def test_presample(self, mock_log):
+        self.assertEqual((None, True), Sampler().presample())
+        sampler = Sampler(sample_rate=0.5, random=iter([0.7]).__next__)
+        roll, kept = sampler.presample()
+        self.assertFalse(kept)
+        # a route sampled at a higher rate keeps it, with the same roll
+        self.assertTrue(sampler.should_log("route", 0.8, roll))
+        self.assertFalse(sampler.should_log("route", None, roll))
+
+    def test_route_sample_rate_from_decorator(self, mock_log):
+        self._call(LoggingMiddleware(self.get_response), "/never_sampled")
+        self.assertFalse(mock_log.log.called)
+        self._call(LoggingMiddleware(self.get_response), "/somewhere")
+        self._assert_logged(mock_log, "some body")
+
+    @override_settings(
+        REQUEST_LOGGING_RATE_LIMIT=1, REQUEST_LOGGING_RATE_LIMIT_BURST=2, REQUEST_LOGGING_ENABLE_COLORIZE=False
+    )
+    def test_rate_limit_per_route(self, mock_log):
+        middleware = LoggingMiddleware(self.get_response)
+        for _ in range(5):
+            self._call(middleware)
+        self._call(middleware, "/test_func")
+        calls = [call[0][1] for call in mock_log.log.call_args_list]
+        self.assertEqual(2, calls.count("POST /somewhere - 200"))
+        self.assertEqual(1, calls.count("POST /test_func - 200"))
+
+    def test_token_bucket_refills(self, mock_log):
+        now = [0.0]
+        sampler = Sampler(rate_limit=1, rate_limit_burst=1, clock=lambda: now[0])
+        self.assertTrue(sampler.should_log("route"))
+        self.assertFalse(sampler.should_log("route"))
+        now[0] = 1.0
+        self.assertTrue(sampler.should_log("route"))
+
+    def test_sample_rate(self, mock_log):
+        sampler = Sampler(sample_rate=0.5, random=iter([0.2, 0.7]).__next__)
+        self.assertTrue(sampler.should_log("route"))
+        self.assertFalse(sampler.should_log("route"))
+
+    @override_settings(REQUEST_LOGGING_SAMPLE_RATE=2)
+    def test_invalid_sample_rate(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+    @override_settings(REQUEST_LOGGING_RATE_LIMIT="fast")
+    def test_invalid_rate_limit(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class DisabledLevelTestCase(BaseLogTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.request = self.factory.post("/somewhere", data={"file": u"some body"})
+        self.request.urlconf = "test_urls"
+        self.response = HttpResponse('{"response": "body"}', content_type="application/json")
+
+    def _enable_info(self, mock_log):
+        mock_log.isEnabledFor.side_effect = lambda level: level >= logging.INFO
+
+    def test_debug_data_not_processed(self, mock_log):
+        self._enable_info(mock_log)
+        middleware = LoggingMiddleware(lambda request: self.response)
+        with mock.patch.object(middleware, "_build_request_headers") as build_request_headers, mock.patch.object(
+            middleware.logger, "_colorize", side_effect=lambda text, colour: text
+        ) as colorize, mock.patch.object(middleware, "_chunked_to_max") as chunked_to_max:
+            middleware.__call__(self.request)
+        self.assertFalse(build_request_headers.called)
+        self.assertFalse(chunked_to_max.called)
+        self.assertEqual(2, colorize.call_count)
+        self.assertEqual({logging.INFO}, set(call[0][0] for call in mock_log.log.call_args_list))
+        self._assert_logged(mock_log, "POST /somewhere - 200")
+
+    @override_settings(REQUEST_LOGGING_EMITTER="queue")
+    def test_disabled_records_not_queued(self, mock_log):
+        self._enable_info(mock_log)
+        middleware = LoggingMiddleware(lambda request: self.response)
+        with mock.patch.object(middleware.logger, "_put") as put:
+            middleware.__call__(self.request)
+        self.assertEqual({logging.INFO}, set(call[0][0][1] for call in put.call_args_list))
+
+    @override_settings(REQUEST_LOGGING_STRUCTURED=True)
+    def test_structured_record_not_built(self, mock_log):
+        mock_log.isEnabledFor.return_value = False
+        middleware = LoggingMiddleware(lambda request: self.response)
+        with mock.patch.object(middleware, "_get_response_body") as get_response_body:
+            middleware.__call__(self.request)
+        self.assertFalse(get_response_body.called)
+        self.assertFalse(mock_log.log.called)
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class TimingTestCase(BaseLogTestCase):
+    def setUp(self):
+        from django.urls import set_urlconf
+
+        set_urlconf("test_urls")
+        self.factory = RequestFactory()
+        latency_histogram.reset()
+
+        def get_response(request):
+            threading.Event().wait(0.01)
+            return HttpResponse('{"example":"response"}', content_type="application/json", status=404)
+
+        self.get_response = get_response
+
+    def tearDown(self):
+        latency_histogram.reset()
+
+    def test_timings_attached_to_request(self, mock_log):
+        request = self.factory.post("/somewhere", data={"file": u"some body"})
+        LoggingMiddleware(self.get_response).__call__(request)
+        timings = getattr(request, REQUEST_TIMINGS_ATTR)
+        self.assertGreaterEqual(timings.view, 0.01)
+        self.assertGreater(timings.logging, 0)
+        self.assertGreater(timings.headers, 0)
+        self.assertGreater(timings.multipart, 0)
+        self.assertGreaterEqual(timings.as_dict()["overhead"], timings.logging)
+
+    @override_settings(REQUEST_LOGGING_STRUCTURED=True)
+    def test_timings_in_structured_record(self, mock_log):
+        request = self.factory.post("/somewhere", data="some body", content_type="text/plain")
+        LoggingMiddleware(self.get_response).__call__(request)
+        fields = mock_log.log.call_args[1]["extra"][STRUCTURED_RECORD_ATTR]
+        self.assertGreaterEqual(fields["duration"], 0.01)
+        self.assertEqual(
+            {"view", "resolve", "headers", "body", "multipart", "emit", "overhead"}, set(fields["timings"])
+        )
+
+    @override_settings(REQUEST_LOGGING_LATENCY_HISTOGRAM=True)
+    def test_latency_histogram(self, mock_log):
+        middleware = LoggingMiddleware(self.get_response)
+        for _ in range(3):
+            middleware.__call__(self.factory.get("/somewhere"))
+        dump = latency_histogram.dump()
+        self.assertEqual(["test_urls.general_resource"], list(dump))
+        histograms = dump["test_urls.general_resource"]["4xx"]
+        self.assertEqual(3, histograms["view"]["count"])
+        self.assertEqual(3, sum(histograms["view"]["buckets"].values()))
+        self.assertEqual(0, histograms["view"]["buckets"]["0.001"])
+        self.assertEqual(3, histograms["overhead"]["count"])
+
+    @override_settings(REQUEST_LOGGING_LATENCY_HISTOGRAM=True)
+    def test_latency_histogram_when_nothing_is_logged(self, mock_log):
+        # e.g. django.request at WARNING
+        mock_log.isEnabledFor.return_value = False
+        LoggingMiddleware(self.get_response).__call__(self.factory.get("/somewhere"))
+        self.assertFalse(mock_log.log.called)
+        self.assertEqual(1, latency_histogram.dump()["test_urls.general_resource"]["4xx"]["view"]["count"])
+
+    def test_latency_histogram_disabled_by_default(self, mock_log):
+        LoggingMiddleware(self.get_response).__call__(self.factory.get("/somewhere"))
+        self.assertEqual({}, latency_histogram.dump())
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class FlightRecorderTestCase(BaseLogTestCase):
+    def setUp(self):
+        from django.urls import set_urlconf
+
+        set_urlconf("test_urls")
+        self.factory = RequestFactory()
+
+        def get_response(request):
+            return HttpResponse('{"token": "t0k3n", "id": 1}', content_type="application/json", status=201)
+
+        self.get_response = get_response
+
+    def tearDown(self):
+        flight_recorder.configure(0)
+
+    def test_ring_buffer(self, mock_log):
+        recorder = FlightRecorder(3, body_length=4)
+        for i in range(5):
+            recorder.record("GET", "/{}".format(i), 200, 0.1, b"body", memoryview(b"\xe2\x82\xac!"))
+        entries = recorder.entries()
+        self.assertEqual(["/2", "/3", "/4"], [entry.path for entry in entries])
+        self.assertEqual(b"body", entries[0].request_body)
+        self.assertEqual(b"\xe2\x82\xac!", entries[0].response_body)
+        self.assertEqual(u"\u20ac!", recorder.dump()[0]["response_body"])
+        recorder.clear()
+        self.assertEqual([], recorder.entries())
+
+    @override_settings(
+        REQUEST_LOGGING_RECORDER_SIZE=2,
+        REQUEST_LOGGING_RECORDER_BODY_LENGTH=20,
+        REQUEST_LOGGING_SAMPLE_RATE=0,
+        REQUEST_LOGGING_SENSITIVE_QUERY_PARAMS=["key"],
+        REQUEST_LOGGING_SENSITIVE_BODY_KEYS=["token", "password"],
+    )
+    def test_middleware_records_redacted_exchanges(self, mock_log):
+        middleware = LoggingMiddleware(self.get_response)
+        request = self.factory.post(
+            "/somewhere?key=s3cr3t", data='{"password": "hunter2"}', content_type="text/plain"
+        )
+        middleware(request)
+        self.assertFalse(mock_log.log.called)
+
+        exchanges = flight_recorder.dump()
+        self.assertEqual(1, len(exchanges))
+        exchange = exchanges[0]
+        self.assertEqual("POST", exchange["method"])
+        self.assertEqual("/somewhere?key=*****", exchange["path"])
+        self.assertEqual(201, exchange["status"])
+        self.assertEqual('{"password": "*****"', exchange["request_body"])
+        self.assertEqual('{"token": "*****", "', exchange["response_body"])
+
+    def test_disabled_by_default(self, mock_log):
+        middleware = LoggingMiddleware(self.get_response)
+        self.assertIsNone(middleware.flight_recorder)
+        middleware(self.factory.get("/somewhere"))
+        self.assertEqual([], flight_recorder.entries())
+
+    @override_settings(REQUEST_LOGGING_RECORDER_SIZE=-1)
+    def test_invalid_size(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+    @override_settings(REQUEST_LOGGING_RECORDER_SIZE=10)
+    def test_view_and_command(self, mock_log):
+        LoggingMiddleware(self.get_response)(self.factory.get("/somewhere"))
+
+        request = self.factory.get("/recent_requests")
+        request.user = mock.Mock(is_active=True, is_staff=False)
+        with self.assertRaises(PermissionDenied):
+            recent_requests(request)
+        request.user.is_staff = True
+        response = recent_requests(request)
+        self.assertEqual("application/x-ndjson", response["Content-Type"])
+        lines = response.content.decode("utf-8").splitlines()
+        self.assertEqual("/somewhere", json.loads(lines[0])["path"])
+        self.assertIsNone(json.loads(lines[0])["request_body"])
+
+        out = io.StringIO()
+        with mock.patch(
+            "request_logging.management.commands.dump_recent_requests.urlopen",
+            return_value=io.BytesIO(response.content),
+        ) as urlopen:
+            call_command(
+                DumpRecentRequestsCommand(), url="http://host/recent", header=["Cookie: sessionid=abc"], stdout=out
+            )
+        self.assertEqual(response.content.decode("utf-8"), out.getvalue())
+        self.assertEqual("http://host/recent", urlopen.call_args[0][0].full_url)
+        self.assertEqual("sessionid=abc", urlopen.call_args[0][0].get_header("Cookie"))
+
+    @override_settings(REQUEST_LOGGING_RECORDER_SIZE=10)
+    def test_view_is_not_logged_nor_recorded(self, mock_log):
+        from django.urls import re_path
+
+        class RecentRequestsUrls(object):
+            urlpatterns = [re_path(r"^recent_requests$", recent_requests)]
+
+        LoggingMiddleware(self.get_response)(self.factory.get("/somewhere"))
+        entries = flight_recorder.entries()
+        mock_log.reset_mock()
+
+        request = self.factory.get("/recent_requests")
+        request.urlconf = RecentRequestsUrls
+        request.user = mock.Mock(is_active=True, is_staff=True)
+        LoggingMiddleware(recent_requests)(request)
+        self.assertEqual(entries, flight_recorder.entries())
+        self.assertFalse(mock_log.log.called)
+
+    def test_command_requires_url(self, mock_log):
+        # The recorder of the command's own process is always empty
+        with self.assertRaises(CommandError):
+            call_command(DumpRecentRequestsCommand())
+
+
+class RedactorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.redactor = Redactor(
+            headers=["HTTP_X_API_KEY", "Authorization"],
+            query_params=["token"],
+            body_keys=["user.password", "card"],
+            form_fields=["password"],
+            patterns=[r"\b(?:\d[ -]?){13,16}\b"],
+        )
+
+    def test_headers_normalized(self):
+        headers = [("X-Api-Key", "k"), ("HTTP_AUTHORIZATION", "a"), ("authorization", "a"), ("Accept", "*/*")]
+        self.assertEqual(
+            {"X-Api-Key": "*****", "HTTP_AUTHORIZATION": "*****", "authorization": "*****", "Accept": "*/*"},
+            self.redactor.redact_headers(headers),
+        )
+
+    def test_query(self):
+        self.assertEqual("/a?x=1&TOKEN=*****&mytoken=2", self.redactor.redact_query("/a?x=1&TOKEN=abc&mytoken=2"))
+        self.assertEqual("/a/token=1", self.redactor.redact_query("/a/token=1"))
+
+    def test_json_body(self):
+        body = '{"user": {"Password": "p\\"w"}, "card": 4111, "number": "4111 1111 1111 1111", "password_hint": 1}'
+        self.assertEqual(
+            '{"user": {"Password": "*****"}, "card": "*****", "number": "*****", "password_hint": 1}',
+            self.redactor.redact_text(body),
+        )
+
+    def test_form_body(self):
+        self.assertEqual("a=1&password=*****&b=2", self.redactor.redact_text("a=1&password=sec ret&b=2"))
+
+    def test_nothing_to_redact(self):
+        redactor = Redactor()
+        self.assertIsNone(redactor.body_regex)
+        self.assertEqual("password=1", redactor.redact_text("password=1"))
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class RedactionTestCase(BaseLogTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _call(self, request):
+        request.urlconf = "test_urls"
+        request.body
+        LoggingMiddleware(lambda request: HttpResponse('{"token": "t0k3n"}', content_type="application/json"))(
+            request
+        )
+
+    @override_settings(
+        REQUEST_LOGGING_ENABLE_COLORIZE=False,
+        REQUEST_LOGGING_SENSITIVE_HEADERS=["X-Api-Key"],
+        REQUEST_LOGGING_SENSITIVE_QUERY_PARAMS=["signature"],
+        REQUEST_LOGGING_SENSITIVE_BODY_KEYS=["token", "password"],
+        REQUEST_LOGGING_SENSITIVE_FORM_FIELDS=["password"],
+    )
+    def test_request_and_response_redacted(self, mock_log):
+        request = self.factory.post(
+            "/somewhere?signature=s1gn",
+            data='{"password": "hunter2"}',
+            content_type="application/json",
+            HTTP_X_API_KEY="k3y",
+        )
+        self._call(request)
+        self._call(self.factory.post("/somewhere", data={"password": "hunter2", "name": "joe"}))
+        self._assert_logged(mock_log, "signature=*****")
+        self._assert_logged(mock_log, '"password": "*****"')
+        self._assert_logged(mock_log, '"token": "*****"')
+        self._assert_logged(mock_log, "joe")
+        for secret in ("s1gn", "hunter2", "k3y", "t0k3n"):
+            self._assert_not_logged(mock_log, secret)
+
+    @override_settings(
+        REQUEST_LOGGING_ENABLE_COLORIZE=False,
+        REQUEST_LOGGING_SENSITIVE_HEADERS=["Authorization", "Set-Cookie", "X-Api-Key"],
+    )
+    def test_response_headers_redacted(self, mock_log):
+        response = HttpResponse('{"id": 1}', content_type="application/json")
+        response["Set-Cookie"] = "sessionid=s3ss10n"
+        response["X-Api-Key"] = "k3y"
+        request = self.factory.get("/somewhere", HTTP_AUTHORIZATION="Bearer t0k3n")
+        request.urlconf = "test_urls"
+        LoggingMiddleware(lambda request: response)(request)
+        self._assert_logged(mock_log, "'Set-Cookie': '*****'")
+        self._assert_logged(mock_log, "'X-Api-Key': '*****'")
+        self._assert_logged(mock_log, "'Content-Type': 'application/json'")
+        for secret in ("s3ss10n", "k3y", "t0k3n"):
+            self._assert_not_logged(mock_log, secret)
+        self.assertEqual("sessionid=s3ss10n", response["Set-Cookie"])
+
+    @override_settings(REQUEST_LOGGING_STRUCTURED=True, REQUEST_LOGGING_SENSITIVE_HEADERS=["X-Api-Key"])
+    def test_structured_response_headers_redacted(self, mock_log):
+        response = HttpResponse('{"id": 1}', content_type="application/json")
+        response["X-Api-Key"] = "k3y"
+        request = self.factory.get("/somewhere")
+        request.urlconf = "test_urls"
+        LoggingMiddleware(lambda request: response)(request)
+        fields = mock_log.log.call_args[1]["extra"][STRUCTURED_RECORD_ATTR]
+        self.assertEqual("*****", fields["response_headers"]["X-Api-Key"])
+
+    @override_settings(REQUEST_LOGGING_STRUCTURED=True, REQUEST_LOGGING_SENSITIVE_BODY_KEYS=["token"])
+    def test_structured_bodies_redacted(self, mock_log):
+        self._call(self.factory.post("/somewhere", data='{"token": "abc"}', content_type="application/json"))
+        fields = mock_log.log.call_args[1]["extra"][STRUCTURED_RECORD_ATTR]
+        self.assertEqual('{"token": "*****"}', fields["request_body"])
+        self.assertEqual('{"token": "*****"}', fields["response_body"])
+
+    @override_settings(REQUEST_LOGGING_SENSITIVE_PATTERNS="card")
+    def test_invalid_setting(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+
+class HeaderFilterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.request = self.factory.post(
+            "/somewhere", data="{}", content_type="application/json", HTTP_X_REQUEST_ID="42", HTTP_X_FORWARDED_FOR="ip"
+        )
+        self.response = HttpResponse("{}", content_type="application/json")
+        self.response["X-Request-Id"] = "42"
+
+    def test_allowlist(self):
+        header_filter = HeaderFilter(["HTTP_X_REQUEST_ID", "content-type", "X-Missing", "X-Cache"], ["x-cache"])
+        self.assertEqual(("x-request-id", "content-type", "x-missing"), header_filter.allowed)
+        self.assertEqual(
+            [("X-Request-Id", "42"), ("Content-Type", "application/json")], header_filter.request_headers(self.request)
+        )
+        self.assertEqual(
+            {"X-Request-Id": "42", "Content-Type": "application/json"}, header_filter.response_headers(self.response)
+        )
+
+    def test_allowlist_meta_names(self):
+        header_filter = HeaderFilter(["X-Request-Id"], meta_names=True)
+        self.assertEqual([("HTTP_X_REQUEST_ID", "42")], header_filter.request_headers(self.request))
+
+    def test_denylist(self):
+        header_filter = HeaderFilter(denylist=["HTTP_X_FORWARDED_FOR", "Content-Type"])
+        request_headers = dict(header_filter.request_headers(self.request))
+        self.assertIn("X-Request-Id", request_headers)
+        self.assertNotIn("X-Forwarded-For", request_headers)
+        self.assertNotIn("Content-Type", request_headers)
+        self.assertEqual({"X-Request-Id": "42"}, header_filter.response_headers(self.response))
+
+    def test_inactive_by_default(self):
+        self.assertFalse(HeaderFilter().active)
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class HeaderFilterSettingsTestCase(BaseLogTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _call(self):
+        request = self.factory.get(
+            "/somewhere", HTTP_X_REQUEST_ID="r1d", HTTP_X_FORWARDED_FOR="f0rw", HTTP_AUTHORIZATION="s3cr3t"
+        )
+        request.urlconf = "test_urls"
+
+        def get_response(request):
+            response = HttpResponse("{}", content_type="application/json")
+            response["X-Cache"] = "h1t"
+            return response
+
+        LoggingMiddleware(get_response)(request)
+
+    @override_settings(
+        REQUEST_LOGGING_ENABLE_COLORIZE=False,
+        REQUEST_LOGGING_HEADER_ALLOWLIST=["X-Request-Id", "Authorization", "Content-Type"],
+    )
+    def test_allowlist(self, mock_log):
+        self._call()
+        self._assert_logged(mock_log, "r1d")
+        self._assert_logged(mock_log, "application/json")
+        for value in ("f0rw", "h1t", "s3cr3t"):
+            self._assert_not_logged(mock_log, value)
+
+    @override_settings(
+        REQUEST_LOGGING_ENABLE_COLORIZE=False, REQUEST_LOGGING_HEADER_DENYLIST=["X-Forwarded-For", "x-cache"]
+    )
+    def test_denylist(self, mock_log):
+        self._call()
+        self._assert_logged(mock_log, "r1d")
+        self._assert_not_logged(mock_log, "f0rw")
+        self._assert_not_logged(mock_log, "h1t")
+
+    @override_settings(REQUEST_LOGGING_HEADER_ALLOWLIST="X-Request-Id")
+    def test_invalid_setting(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+
+class SummarizerRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.registry = SummarizerRegistry(
+            {"application/json": JSONSummarizer(), "+json": JSONSummarizer(keys=["a"]), "image/*": SizeSummarizer()}
+        )
+
+    def test_lookup_order(self):
+        self.assertEqual("application/json", self.registry.get("Application/JSON; charset=utf-8")[0])
+        self.assertIs(self.registry.get("application/json")[1], self.registry.get("application/json")[1])
+        self.assertEqual('{"a": 1}', self.registry.summarize("application/problem+json", b'{"a": 1, "b": 2}', 16))
+        self.assertEqual("(image/png: 1234 bytes)", self.registry.summarize("image/png", b"\x89PNG", 1234))
+        self.assertIsNone(self.registry.summarize("text/plain", b"text", 4))
+
+    def test_register_none_unregisters(self):
+        self.registry.get("image/png")
+        self.registry.register("image/*", None)
+        self.assertIsNone(self.registry.get("image/png")[1])
+
+    def test_json_depth(self):
+        summarizer = JSONSummarizer(max_depth=1)
+        body = b'{"a": {"b": 1}, "c": [1], "d": 2}'
+        summary = summarizer(body, "application/json", len(body))
+        self.assertEqual({"a": "{...}", "c": "[...]", "d": 2}, json.loads(summary))
+
+    def test_truncated_json_logged_as_text(self):
+        summarizer = JSONSummarizer(keys=["a"])
+        self.assertEqual('{"a": 1, "b', summarizer(b'{"a": 1, "b', "application/json", 100))
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class BodySummarizerTestCase(BaseLogTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _call(self, request, response):
+        request.urlconf = "test_urls"
+        LoggingMiddleware(lambda request: response).__call__(request)
+
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_request_bodies_summarized(self, mock_log):
+        request = self.factory.post("/somewhere", data=b"\x89PNG\r\n" * 10, content_type="image/png")
+        request.body
+        self._call(request, HttpResponse())
+        self._assert_logged(mock_log, "(image/png: 60 bytes)")
+        self._assert_not_logged(mock_log, "PNG")
+
+        request = self.factory.post("/somewhere", data="a=b%20c&d=", content_type="application/x-www-form-urlencoded")
+        request.body
+        self._call(request, HttpResponse())
+        self._assert_logged(mock_log, "a=b c&d=")
+
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_request_bodies_without_summarizer(self, mock_log):
+        request = self.factory.post("/somewhere", data=b"%PDF-1.4\xe2\x9c", content_type="application/pdf")
+        self._call(request, HttpResponse())
+        self._assert_logged(mock_log, "(application/pdf: 10 bytes)")
+        self._assert_not_logged(mock_log, "PDF-1.4")
+
+        request = self.factory.post("/somewhere", data=b"some body", content_type="")
+        self._call(request, HttpResponse())
+        self._assert_logged(mock_log, "some body")
+
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_response_logged_by_content_type(self, mock_log):
+        self._call(self.factory.get("/somewhere"), HttpResponse("<a>xml</a>", content_type="application/xml"))
+        self._assert_logged(mock_log, "<a>xml</a>")
+        self._call(self.factory.get("/somewhere"), HttpResponse(b"\x00\x01", content_type="application/x-protobuf"))
+        self._assert_logged(mock_log, "(application/x-protobuf: 2 bytes)")
+        self._call(self.factory.get("/somewhere"), HttpResponse("<html>", content_type="text/html"))
+        self._assert_logged(mock_log, "<html>")
+        self._call(self.factory.get("/somewhere"), HttpResponse(b"%PDF-1.4", content_type="application/pdf"))
+        self._assert_not_logged(mock_log, "%PDF")
+        self._assert_logged(mock_log, "(application/pdf: 8 bytes)")
+
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_problem_json_response(self, mock_log):
+        response = HttpResponse('{"title": "Not Found"}', content_type="application/problem+json", status=404)
+        self._call(self.factory.get("/somewhere"), response)
+        self._assert_logged(mock_log, '{"title": "Not Found"}')
+
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE=False, REQUEST_LOGGING_MAX_BODY_LENGTH=15)
+    def test_response_body_read_from_chunks(self, mock_log):
+        response = HttpResponse(iter([b"a" * 10, b"b" * 10, b"c" * 10]), content_type="text/plain")
+        with mock.patch.object(HttpResponse, "content", new_callable=mock.PropertyMock) as content:
+            self._call(self.factory.get("/somewhere"), response)
+        self.assertFalse(content.called)
+        self._assert_logged(mock_log, "a" * 10 + "b" * 5)
+        self._assert_not_logged(mock_log, "c")
+
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_file_response_size_only(self, mock_log):
+        response = FileResponse(io.BytesIO(b"x" * 100))
+        self._call(self.factory.get("/somewhere"), response)
+        self._assert_logged(mock_log, "(application/octet-stream: 100 bytes)")
+        self.assertEqual(b"x" * 100, b"".join(response.streaming_content))
+
+    @override_settings(
+        REQUEST_LOGGING_ENABLE_COLORIZE=False,
+        REQUEST_LOGGING_BODY_SUMMARIZERS={"application/json": JSONSummarizer(keys=["id"]), "application/xml": None},
+    )
+    def test_summarizers_setting(self, mock_log):
+        response = HttpResponse('{"id": 1, "secret": 2}', content_type="application/json")
+        self._call(self.factory.get("/somewhere"), response)
+        self._assert_logged(mock_log, '{"id": 1}')
+        self._assert_not_logged(mock_log, "secret")
+        self._call(self.factory.get("/somewhere"), HttpResponse("<a>xml</a>", content_type="application/xml"))
+        self._assert_not_logged(mock_log, "<a>xml</a>")
+
+    @override_settings(REQUEST_LOGGING_BODY_SUMMARIZERS=[])
+    def test_invalid_summarizers_setting(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class StreamingResponseTestCase(BaseLogTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.request = self.factory.get("/somewhere")
+        self.request.urlconf = "test_urls"
+
+    def _response(self):
+        chunks = [b'{"chunk": 1}', b'{"chunk": 2}', b'{"chunk": 3}']
+        return StreamingHttpResponse(streaming_content=iter(chunks), content_type="application/json")
+
+    @override_settings(
+        REQUEST_LOGGING_LOG_STREAMING_RESPONSES=True,
+        REQUEST_LOGGING_MAX_BODY_LENGTH=20,
+        REQUEST_LOGGING_ENABLE_COLORIZE=False,
+    )
+    def test_streamed_body_logged_when_finished(self, mock_log):
+        response = self._response()
+        LoggingMiddleware().process_response(self.request, response)
+        self._assert_not_logged(mock_log, "chunk")
+
+        self.assertEqual(b'{"chunk": 1}{"chunk": 2}{"chunk": 3}', b"".join(response.streaming_content))
+        self._assert_logged(mock_log, '{"chunk": 1}{"chunk"')
+        self._assert_not_logged(mock_log, '{"chunk": 1}{"chunk": 2}')
+        self._assert_logged(mock_log, "(data_stream: 36 bytes in ")
+
+    @override_settings(REQUEST_LOGGING_LOG_STREAMING_RESPONSES=True, REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_closed_stream_is_logged(self, mock_log):
+        response = self._response()
+        LoggingMiddleware().process_response(self.request, response)
+        next(iter(response.streaming_content))
+        response.close()
+        self._assert_logged(mock_log, '{"chunk": 1}')
+        self._assert_logged(mock_log, "(data_stream: 12 bytes in ")
+
+    @override_settings(REQUEST_LOGGING_LOG_STREAMING_RESPONSES=True, REQUEST_LOGGING_STRUCTURED=True)
+    def test_structured_stream_record(self, mock_log):
+        response = self._response()
+        LoggingMiddleware(lambda request: response).__call__(self.request)
+        b"".join(response.streaming_content)
+        self.assertEqual(2, mock_log.log.call_count)
+        fields = mock_log.log.call_args[1]["extra"][STRUCTURED_RECORD_ATTR]
+        self.assertEqual(b'{"chunk": 1}{"chunk": 2}{"chunk": 3}', fields["response_body"])
+        self.assertEqual(36, fields["stream_length"])
+
+    def test_async_tee(self, mock_log):
+        import asyncio
+        from request_logging.async_support import AsyncStreamingContentTee
+
+        finished = []
+        loop = asyncio.new_event_loop()
+
+        class AsyncChunks(object):
+            def __init__(self, chunks):
+                self.chunks = list(chunks)
+
+            def __anext__(self):
+                future = loop.create_future()
+                if self.chunks:
+                    future.set_result(self.chunks.pop(0))
+                else:
+                    future.set_exception(StopAsyncIteration())
+                return future
+
+        tee = AsyncStreamingContentTee(AsyncChunks([b"abc", b"def"]), 4, lambda *args: finished.append(args))
+        chunks = [loop.run_until_complete(tee.__anext__()) for _ in range(2)]
+        with self.assertRaises(StopAsyncIteration):
+            loop.run_until_complete(tee.__anext__())
+        loop.close()
+        self.assertEqual([b"abc", b"def"], chunks)
+        self.assertEqual((b"abcd", 6), finished[0][:2])
+
+
 @mock.patch.object(request_logging.middleware, "request_logger")
 class LogSettingsLogLevelTestCase(BaseLogSettingsTestCase):
     def test_logging_default_debug_level(self, mock_log):
@@ -355,6 +1620,83 @@ class LogSettingsHttp4xxAsErrorTestCase(BaseLogTestCase):
         with self.assertRaises(ValueError):
             LoggingMiddleware()
 
+    @override_settings(
+        REQUEST_LOGGING_STATUS_LOG_LEVELS={"4xx": logging.WARNING},
+        REQUEST_LOGGING_ROUTE_LOG_LEVELS={r"^/not-a-valid": {404: logging.DEBUG}},
+    )
+    def test_route_log_levels(self, mock_log):
+        middleware = LoggingMiddleware()
+        middleware.process_response(self.request, self.response_404)
+        self.assertEqual({logging.DEBUG}, set(call[0][0] for call in mock_log.log.call_args_list))
+
+        mock_log.reset_mock()
+        middleware.process_response(self.factory.get("/somewhere"), self.response_404)
+        self.assertEqual({logging.WARNING}, set(call[0][0] for call in mock_log.log.call_args_list))
+
+    def test_disabled_levels_skip_formatting(self, mock_log):
+        mock_log.isEnabledFor.return_value = False
+        middleware = LoggingMiddleware(lambda request: self.response_404)
+        with mock.patch.object(middleware, "_build_request_headers") as build_request_headers:
+            middleware.__call__(self.request)
+        self.assertFalse(build_request_headers.called)
+        self.assertFalse(mock_log.log.called)
+
+    def test_invalid_status_log_levels(self, mock_log):
+        for status_log_levels in ([], {"4XX": logging.INFO}, {404: "DEBUG"}):
+            with override_settings(REQUEST_LOGGING_STATUS_LOG_LEVELS=status_log_levels):
+                with self.assertRaises(ValueError):
+                    LoggingMiddleware()
+
+
+class LogLevelTableTestCase(unittest.TestCase):
+    def test_default_levels(self):
+        table = LogLevelTable(logging.DEBUG, logging.ERROR, True)
+        self.assertEqual((logging.INFO, logging.DEBUG, logging.INFO, logging.DEBUG, False), table.get("/", 200)[:5])
+        self.assertEqual((logging.INFO, logging.ERROR, logging.INFO, logging.ERROR, True), table.get("/", 404)[:5])
+        self.assertEqual((logging.INFO, logging.ERROR, logging.INFO, logging.ERROR, True), table.get("/", 503)[:5])
+        self.assertEqual(logging.DEBUG, table.get("/", 799).response_data)
+
+        table = LogLevelTable(logging.DEBUG, logging.WARNING, False)
+        self.assertEqual((logging.INFO, logging.WARNING, logging.WARNING, logging.DEBUG), table.get("/", 404)[:4])
+        self.assertEqual(logging.WARNING, table.get("/", 404).highest)
+
+    def test_overrides(self):
+        table = LogLevelTable(
+            logging.DEBUG,
+            logging.ERROR,
+            True,
+            {404: logging.WARNING, "5xx": logging.CRITICAL},
+            {r"^/health": {404: logging.DEBUG}, r"^/h": {"2xx": logging.DEBUG}},
+        )
+        self.assertEqual((logging.WARNING,) * 4, table.get("/", 404)[:4])
+        self.assertEqual(logging.ERROR, table.get("/", 400).response_data)
+        self.assertEqual((logging.CRITICAL,) * 4, table.get("/", 502)[:4])
+        self.assertEqual((logging.DEBUG,) * 4, table.get("/health/", 404)[:4])
+        self.assertEqual((logging.CRITICAL,) * 4, table.get("/health/", 500)[:4])
+        # the first matching route wins
+        self.assertEqual(logging.INFO, table.get("/health/", 200).request)
+        self.assertEqual(logging.DEBUG, table.get("/home", 200).request)
+
+    def test_routes_with_groups_and_flags(self):
+        table = LogLevelTable(
+            logging.DEBUG,
+            logging.ERROR,
+            True,
+            route_levels={
+                r"^/(?P<pk>\d+)/$": {"2xx": logging.INFO},
+                r"^/(?P<pk>\d+)/edit$": {"2xx": logging.WARNING},
+                r"(?i)^/HEALTH": {"2xx": logging.CRITICAL},
+            },
+        )
+        self.assertEqual(logging.INFO, table.get("/1/", 200).request)
+        self.assertEqual(logging.WARNING, table.get("/1/edit", 200).request)
+        self.assertEqual(logging.CRITICAL, table.get("/health", 200).request)
+        self.assertEqual(logging.DEBUG, table.get("/other", 200).request_data)
+
+    def test_invalid_route_regex(self):
+        with self.assertRaisesRegex(ValueError, r"\^/\(unclosed"):
+            LogLevelTable(logging.DEBUG, logging.ERROR, True, route_levels={r"^/(unclosed": {404: logging.DEBUG}})
+
 
 @mock.patch.object(request_logging.middleware, "request_logger")
 class LogSettingsColorizeTestCase(BaseLogSettingsTestCase):
@@ -374,6 +1716,33 @@ class LogSettingsColorizeTestCase(BaseLogSettingsTestCase):
         with self.assertRaises(ValueError):
             LoggingMiddleware()
 
+    def test_colour_codes(self, mock_log):
+        from django.utils.termcolors import colorize
+
+        middleware = LoggingMiddleware()
+        middleware.logger.log(logging.INFO, "one\r\ntwo", {"args": (), "kwargs": {}})
+        middleware.logger.log(logging.ERROR, "three", {"args": (), "kwargs": {}})
+        self.assertEqual(
+            [colorize("one", fg="cyan"), colorize("two", fg="cyan"), colorize("three", fg="magenta")],
+            [call[0][1] for call in mock_log.log.call_args_list],
+        )
+
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE="auto")
+    def test_auto_colorize(self, mock_log):
+        tty = mock.Mock()
+        tty.isatty.return_value = True
+        logger = logging.getLogger("request_logging_tests.tty")
+        with mock.patch.object(request_logging.middleware, "request_logger", logger):
+            handler = logging.StreamHandler(io.StringIO())
+            logger.addHandler(handler)
+            logger.propagate = False
+            try:
+                self.assertNotIsInstance(LoggingMiddleware().logger, request_logging.middleware.ColourLogger)
+                handler.stream = tty
+                self.assertIsInstance(LoggingMiddleware().logger, request_logging.middleware.ColourLogger)
+            finally:
+                logger.removeHandler(handler)
+
     @override_settings(REQUEST_LOGGING_DISABLE_COLORIZE=False)
     def test_legacy_settings(self, mock_log):
         middleware = LoggingMiddleware()
@@ -422,8 +1791,8 @@ class LogSettingsMaxLengthTestCase(BaseLogTestCase):
         middleware = LoggingMiddleware(self.get_response)
         middleware.__call__(request)
 
-        request_body_str = request.body if isinstance(request.body, str) else request.body.decode()
-        self._assert_logged(mock_log, re.sub(r"\r?\n", "", request_body_str[:DEFAULT_MAX_BODY_LENGTH]))
+        self._assert_logged(mock_log, "bytes (truncated)")
+        self._assert_logged(mock_log, "000")
         self._assert_not_logged(mock_log, body)
 
     @override_settings(REQUEST_LOGGING_MAX_BODY_LENGTH=150, REQUEST_LOGGING_ENABLE_COLORIZE=False)
@@ -433,16 +1802,98 @@ class LogSettingsMaxLengthTestCase(BaseLogTestCase):
         middleware = LoggingMiddleware(self.get_response)
         middleware.__call__(request)
 
-        request_body_str = request.body if isinstance(request.body, str) else request.body.decode()
-        self._assert_logged(mock_log, re.sub(r"\r?\n", "", request_body_str[:150]))
+        self._assert_logged(mock_log, "bytes (truncated)")
+        self._assert_logged(mock_log, "000")
         self._assert_not_logged(mock_log, body)
 
+    @override_settings(REQUEST_LOGGING_MAX_BODY_LENGTH=5, REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_multibyte_character_cut_by_max_body_length(self, mock_log):
+        body = u"h\u00e9\u00e9llo"  # "hé" takes 3 bytes, the second "é" is cut after its first byte
+        request = self.factory.post("/somewhere", data=body.encode("utf-8"), content_type="text/plain")
+        LoggingMiddleware(self.get_response).__call__(request)
+        self._assert_logged(mock_log, u"h\u00e9\u00e9")
+        self._assert_not_logged(mock_log, u"\ufffd")
+
+    @override_settings(REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_body_logged_as_text(self, mock_log):
+        request = self.factory.post("/somewhere", data="some body", content_type="text/plain")
+        LoggingMiddleware(self.get_response).__call__(request)
+        self._assert_logged(mock_log, "some body")
+        self._assert_not_logged(mock_log, "b'some body'")
+
+    def test_truncation_does_not_copy(self, mock_log):
+        middleware = LoggingMiddleware()
+        body = b"0" * (DEFAULT_MAX_BODY_LENGTH + 1)
+        truncated = middleware._chunked_to_max(body)
+        self.assertIsInstance(truncated, memoryview)
+        self.assertIs(body, truncated.obj)
+        self.assertEqual(DEFAULT_MAX_BODY_LENGTH, len(truncated))
+
     @override_settings(REQUEST_LOGGING_MAX_BODY_LENGTH="Not an int")
     def test_invalid_max_body_length(self, mock_log):
         with self.assertRaises(ValueError):
             LoggingMiddleware()
 
 
+@mock.patch.object(request_logging.middleware, "request_logger")
+class LazyBodyCaptureTestCase(BaseLogTestCase):
+    def setUp(self):
+        from django.urls import set_urlconf
+
+        set_urlconf("test_urls")
+        self.factory = RequestFactory()
+        self.streamed = []
+
+        def get_response(request):
+            chunk = request.read(64)
+            while chunk:
+                self.streamed.append(chunk)
+                chunk = request.read(64)
+            return HttpResponse(status=200)
+
+        self.get_response = get_response
+
+    @override_settings(REQUEST_LOGGING_MAX_BODY_LENGTH=100, REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_streamed_body_is_truncated_and_left_intact(self, mock_log):
+        body = 1000 * "0" + "1"
+        request = self.factory.post("/somewhere", data=body, content_type="text/plain")
+        LoggingMiddleware(self.get_response).__call__(request)
+        self.assertEqual(body.encode(), b"".join(self.streamed))
+        self._assert_logged(mock_log, 100 * "0")
+        self._assert_not_logged(mock_log, 101 * "0")
+
+    @override_settings(REQUEST_LOGGING_MAX_BODY_LENGTH=100, REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_unread_body_is_still_readable(self, mock_log):
+        body = 1000 * "0" + "1"
+        request = self.factory.post("/somewhere", data=body, content_type="text/plain")
+        LoggingMiddleware(lambda request: HttpResponse(status=200)).__call__(request)
+        self._assert_logged(mock_log, 100 * "0")
+        self.assertEqual(body.encode(), request.body)
+
+    @override_settings(REQUEST_LOGGING_MAX_BODY_LENGTH=100, REQUEST_LOGGING_ENABLE_COLORIZE=False)
+    def test_top_up_stops_at_content_length(self, mock_log):
+        from django.test.client import FakePayload
+
+        # ASGI requests read straight from their body file, the test client's FakePayload asserts on reads past its end
+        request = self.factory.get("/somewhere")
+        request._stream = FakePayload(b"")
+        LoggingMiddleware(lambda request: HttpResponse(status=200)).__call__(request)
+        self._assert_logged(mock_log, "GET /somewhere")
+
+        request = self.factory.post("/somewhere", data="some body", content_type="text/plain")
+        request._stream = FakePayload(b"some body")
+        LoggingMiddleware(lambda request: HttpResponse(status=200)).__call__(request)
+        self._assert_logged(mock_log, "some body")
+        self.assertEqual(b"some body", request.body)
+
+    def test_body_not_read_when_not_logged(self, mock_log):
+        request = self.factory.post("/dont_log_body", data="some body", content_type="text/plain")
+        LoggingMiddleware(lambda request: HttpResponse(status=200)).__call__(request)
+        self.assertFalse(hasattr(request, "_body"))
+        self.assertFalse(request._read_started)
+        self._assert_not_logged(mock_log, "some body")
+
+
 @mock.patch.object(request_logging.middleware, "request_logger")
 class DecoratorTestCase(BaseLogTestCase):
     def setUp(self):
@@ -543,6 +1994,137 @@ class DRFTestCase(BaseLogTestCase):
         self._assert_not_logged(mock_log, "had you")
 
 
+@mock.patch.object(request_logging.middleware, "request_logger")
+class RoutePolicyCacheTestCase(BaseLogTestCase):
+    def setUp(self):
+        from django.urls import set_urlconf
+
+        set_urlconf("test_urls")
+        self.factory = RequestFactory()
+
+        def get_response(request):
+            return HttpResponse('{"example":"response"}', content_type="application/json")
+
+        self.get_response = get_response
+
+    def test_route_resolved_once_per_request(self, mock_log):
+        middleware = LoggingMiddleware(self.get_response)
+        request = self.factory.post("/somewhere", data={"file": u"some body"})
+        with mock.patch.object(request_logging.middleware, "resolve", wraps=request_logging.middleware.resolve) as m:
+            middleware.__call__(request)
+        self.assertEqual(1, m.call_count)
+
+    def test_hot_route_skips_resolve(self, mock_log):
+        middleware = LoggingMiddleware(self.get_response)
+        middleware.__call__(self.factory.get("/somewhere"))
+        with mock.patch.object(request_logging.middleware, "resolve", wraps=request_logging.middleware.resolve) as m:
+            middleware.__call__(self.factory.get("/somewhere"))
+        self.assertEqual(0, m.call_count)
+
+    def test_urlconf_set_after_middleware(self, mock_log):
+        def get_response(request):
+            # Like a middleware placed after LoggingMiddleware
+            request.urlconf = "test_urls_alternate"
+            return HttpResponse(status=200)
+
+        request = self.factory.get("/test_route")
+        LoggingMiddleware(get_response).__call__(request)
+        self.assertEqual("test_urls_alternate.view_func", getattr(request, REQUEST_POLICY_ATTR).route_key)
+
+    @override_settings(REQUEST_LOGGING_ROUTE_CACHE_SIZE=2)
+    def test_route_cache_is_bounded(self, mock_log):
+        middleware = LoggingMiddleware(self.get_response)
+        for uri in ("/somewhere", "/test_func", "/test_msg"):
+            middleware.__call__(self.factory.get(uri))
+        self.assertEqual(2, len(middleware.route_cache))
+
+    @override_settings(REQUEST_LOGGING_ROUTE_CACHE_SIZE="Not an int")
+    def test_invalid_route_cache_size(self, mock_log):
+        with self.assertRaises(ValueError):
+            LoggingMiddleware()
+
+
+@mock.patch.object(request_logging.middleware, "request_logger")
+class PolicyIndexTestCase(BaseLogTestCase):
+    def setUp(self):
+        from django.urls import set_urlconf
+
+        set_urlconf(None)
+        self.settings_override = override_settings(
+            ROOT_URLCONF="test_urls",
+            REQUEST_LOGGING_POLICY_INDEX=True,
+            REQUEST_LOGGING_POLICY_INDEX_URLCONFS=["test_urls_alternate"],
+        )
+        self.settings_override.enable()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        from django.urls import set_urlconf
+
+        self.settings_override.disable()
+        set_urlconf("test_urls")
+
+    def _resolved_request(self, uri, method="get", urlconf=None):
+        from django.urls import resolve
+
+        request = getattr(self.factory, method)(uri)
+        if urlconf is not None:
+            request.urlconf = urlconf
+        request.resolver_match = resolve(uri, urlconf=urlconf)
+        return request
+
+    def test_index_covers_urlconfs(self, mock_log):
+        index = LoggingMiddleware().policy_index
+        self.assertEqual("Custom message", index.lookup("test_urls", "^test_msg$", "POST").no_logging_msg)
+        self.assertEqual(
+            "DRF explicit annotation", index.lookup("test_urls", "^widgets$", "GET").no_logging_msg
+        )
+        self.assertIsNotNone(index.lookup("test_urls_alternate", "^test_route$", "POST"))
+        self.assertEqual(
+            sum(1 for policy in index._entries.values() if policy.no_logging), index.suppressed_count
+        )
+
+    def test_lookup_uses_resolver_match(self, mock_log):
+        middleware = LoggingMiddleware()
+        request = self._resolved_request("/widgets")
+        with mock.patch.object(request_logging.middleware, "resolve") as mock_resolve:
+            self.assertEqual("DRF explicit annotation", middleware._should_log_route(request)[1])
+        self.assertFalse(mock_resolve.called)
+
+    def test_lookup_alternate_urlconf(self, mock_log):
+        middleware = LoggingMiddleware()
+        request = self._resolved_request("/test_route", method="post", urlconf="test_urls_alternate")
+        with mock.patch.object(request_logging.middleware, "resolve") as mock_resolve:
+            self.assertEqual(NO_LOGGING_MSG, middleware._should_log_route(request)[1])
+        self.assertFalse(mock_resolve.called)
+
+    def test_end_to_end_uses_index(self, mock_log):
+        from django.conf.urls import url
+        from django.core.handlers.base import BaseHandler
+
+        class IndexedUrls(object):
+            urlpatterns = [url(r"^indexed/(?P<pk>\d+)$", lambda request, pk: HttpResponse(status=200))]
+
+        with override_settings(ROOT_URLCONF=IndexedUrls, MIDDLEWARE=["request_logging.middleware.LoggingMiddleware"]):
+            handler = BaseHandler()
+            handler.load_middleware()
+            with mock.patch.object(request_logging.middleware, "resolve") as mock_resolve:
+                for pk in range(3):
+                    request = self.factory.get("/indexed/{}".format(pk))
+                    self.assertEqual(200, handler.get_response(request).status_code)
+        self.assertFalse(mock_resolve.called)
+        self.assertEqual(0, len(handler._middleware_chain.__wrapped__.route_cache))
+        self.assertIn("<lambda>", getattr(request, REQUEST_POLICY_ATTR).route_key)
+
+    def test_rebuild_policy_index(self, mock_log):
+        middleware = LoggingMiddleware()
+        index = middleware.policy_index
+        middleware.policy_index_urlconfs = []
+        rebuilt = middleware.rebuild_policy_index()
+        self.assertIsNot(index, rebuilt)
+        self.assertIsNone(rebuilt.lookup("test_urls_alternate", "^test_route$", "POST"))
+
+
 @mock.patch.object(request_logging.middleware, "request_logger")
 class LogRequestAtDifferentLevelsTestCase(BaseLogTestCase):
     def setUp(self):